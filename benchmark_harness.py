@@ -0,0 +1,258 @@
+# benchmark_harness.py
+import argparse
+import fnmatch
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+# Registered benchmark cases, in registration order
+CASES = {}
+
+# Function to register a benchmark case. The decorated function runs one repetition
+# (the first warmup also pays for importing the test module) and returns the seconds
+# spent in the operation under test (measured with time.perf_counter), so loading,
+# plotting and printing are not counted; a case that returns nothing is timed around
+# the whole call.
+# setup (optional) runs once before the warmups and its return value is passed to the
+# case, teardown (optional) runs once afterwards. warmup/repeats override the defaults.
+def register(name, setup=None, teardown=None, warmup=None, repeats=None):
+    def decorator(fn):
+        CASES[name] = {'fn': fn, 'setup': setup, 'teardown': teardown, 'warmup': warmup, 'repeats': repeats}
+        return fn
+    return decorator
+
+# Function to summarize repetition times (nanoseconds) in milliseconds
+def summarize(samples_ns):
+    samples_ms = sorted(ns / 1e6 for ns in samples_ns)
+    p95_index = min(len(samples_ms) - 1, max(0, round(0.95 * len(samples_ms)) - 1))
+    return {
+        'repeats': len(samples_ms),
+        'min_ms': samples_ms[0],
+        'median_ms': statistics.median(samples_ms),
+        'p95_ms': samples_ms[p95_index],
+        'mean_ms': statistics.fmean(samples_ms),
+        'stddev_ms': statistics.stdev(samples_ms) if len(samples_ms) > 1 else 0.0,
+        'samples_ms': samples_ms,
+    }
+
+# Function to run one case: setup, untimed warmups, timed repetitions, teardown
+def run_case(name, warmup=1, repeats=5):
+    case = CASES[name]
+    warmup = case['warmup'] if case['warmup'] is not None else warmup
+    repeats = case['repeats'] if case['repeats'] is not None else repeats
+    print(f"\n== {name} ({warmup} warmup, {repeats} repeats)")
+    context = case['setup']() if case['setup'] else None
+    args = () if context is None else (context,)
+    samples = []
+    try:
+        for _ in range(warmup):
+            case['fn'](*args)
+        for _ in range(repeats):
+            start = time.perf_counter_ns()
+            seconds = case['fn'](*args)
+            elapsed_ns = time.perf_counter_ns() - start
+            samples.append(round(seconds * 1e9) if seconds is not None else elapsed_ns)
+    finally:
+        if case['teardown']:
+            case['teardown'](*args)
+    result = summarize(samples)
+    print(f"{name}: median {result['median_ms']:.1f} ms, p95 {result['p95_ms']:.1f} ms, "
+          f"min {result['min_ms']:.1f} ms, stddev {result['stddev_ms']:.1f} ms")
+    return result
+
+# Function to collect the environment the numbers were measured in
+def environment():
+    import numpy
+    import pandas
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'hostname': platform.node(),
+        'platform': platform.platform(),
+        'python': sys.version.split()[0],
+        'cpu_count': os.cpu_count(),
+        'numpy': numpy.__version__,
+        'pandas': pandas.__version__,
+        'git_commit': commit,
+    }
+
+# Function to compare results with a baseline run; a case regresses when its median
+# is more than threshold (a fraction) slower than the baseline median
+def compare_to_baseline(results, baseline, threshold):
+    regressions = []
+    for name, result in results.items():
+        base = baseline['cases'].get(name)
+        if base is None:
+            print(f"{name}: not in baseline")
+            continue
+        change = result['median_ms'] / base['median_ms'] - 1 if base['median_ms'] else 0.0
+        flag = "REGRESSION" if change > threshold else "ok"
+        print(f"{name}: {base['median_ms']:.1f} -> {result['median_ms']:.1f} ms ({change:+.1%}) {flag}")
+        if change > threshold:
+            regressions.append(name)
+    return regressions
+
+# Scratch table for the ingestion case, so the real census_data is never dropped
+BENCH_INGEST_TABLE = 'census_bench_ingest'
+
+def _drop_bench_ingest_table(*_):
+    from sqlalchemy import text
+    import ingestion_test
+    with ingestion_test.engine.begin() as conn:
+        conn.execute(text(f"DROP TABLE IF EXISTS {BENCH_INGEST_TABLE};"))
+
+def _drop_dage_index(*_):
+    from sqlalchemy import text
+    import indexing_test
+    with indexing_test.engine.begin() as conn:
+        # indexing_test creates it unquoted, so the name is folded to lower case
+        conn.execute(text('DROP INDEX IF EXISTS idx_dage;'))
+
+def _create_dage_index(*_):
+    import indexing_test
+    indexing_test.create_index()
+
+# Fold the patches the flat-file update case appended back into the column files
+def _compact_census_cache(*_):
+    from census_loader import compact_census_cache
+    compact_census_cache()
+
+# The existing test scripts, registered as cases (modules are imported only when a case runs).
+# Each returns the duration the test function measured itself.
+@register('ingestion.flat_file', repeats=3)
+def ingestion_flat_file():
+    import ingestion_test
+    return ingestion_test.flat_file_ingestion()
+
+@register('ingestion.postgres_bulk_load', teardown=_drop_bench_ingest_table, warmup=0, repeats=3)
+def ingestion_postgres_bulk_load():
+    from census_ingest_postgres import bulk_load
+    return bulk_load(BENCH_INGEST_TABLE)['total_seconds']
+
+# The flat-file cases time the query on the already-loaded data, like the database cases
+@register('querying.flat_file')
+def querying_flat_file():
+    import querying_test
+    return querying_test.flat_file_query()[0]
+
+@register('querying.postgres')
+def querying_postgres():
+    import querying_test
+    return querying_test.db_query()[0]
+
+# Only the aggregation is timed; the figures are drawn untimed and closed
+@register('visualization.flat_file')
+def visualization_flat_file():
+    import matplotlib.pyplot as plt
+    import visualization_test
+    duration = visualization_test.flat_file_visualization()
+    plt.close('all')
+    return duration
+
+@register('visualization.postgres')
+def visualization_postgres():
+    import matplotlib.pyplot as plt
+    import visualization_test
+    duration = visualization_test.db_visualization()
+    plt.close('all')
+    return duration
+
+# Appending the patch only; the patches are compacted once afterwards
+@register('update.flat_file', teardown=_compact_census_cache, repeats=3)
+def update_flat_file():
+    import update_test
+    return update_test.flat_file_update()
+
+# Each repetition appends a patch untimed and times only its compaction
+@register('update.flat_file_compaction', repeats=3)
+def update_flat_file_compaction():
+    import update_test
+    update_test.flat_file_update()
+    return update_test.flat_file_compaction()
+
+# After the first run no rows match the update predicate, so the warmup leaves the
+# repetitions measuring the steady-state scan cost, not the one-off rewrite
+@register('update.postgres')
+def update_postgres():
+    import update_test
+    return update_test.db_update()
+
+@register('indexing.no_index', setup=_drop_dage_index)
+def indexing_no_index():
+    import indexing_test
+    return indexing_test.db_search_no_index()[0]
+
+@register('indexing.with_index', setup=_create_dage_index)
+def indexing_with_index():
+    import indexing_test
+    return indexing_test.db_search_with_index()[0]
+
+@register('nosql_vs_sql.postgres')
+def nosql_vs_sql_postgres():
+    import nosql_vs_sql_test
+    return nosql_vs_sql_test.sql_query()[0]
+
+@register('nosql_vs_sql.mongo')
+def nosql_vs_sql_mongo():
+    import nosql_vs_sql_test
+    return nosql_vs_sql_test.mongo_query()[0]
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the registered benchmark cases with warmups and repetitions.")
+    parser.add_argument('--case', action='append',
+                        help="Case name or glob, e.g. 'querying.*' (repeatable; default: all)")
+    parser.add_argument('--list', action='store_true', help="List the registered cases and exit")
+    parser.add_argument('--warmup', type=int, default=1, help="Untimed runs before measuring (unless the case sets its own)")
+    parser.add_argument('--repeats', type=int, default=5, help="Timed runs (unless the case sets its own)")
+    parser.add_argument('--output', default='benchmark_results.json', help="Write the results to this JSON file")
+    parser.add_argument('--baseline', help="Compare against this earlier results JSON file")
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help="Flag cases whose median is this fraction slower than the baseline")
+    args = parser.parse_args()
+
+    if args.list:
+        for name in CASES:
+            print(name)
+        return
+
+    patterns = args.case or ['*']
+    names = [name for name in CASES if any(fnmatch.fnmatch(name, pattern) for pattern in patterns)]
+    if not names:
+        parser.error(f"No cases match {patterns}")
+
+    # The visualization cases call plt.show(); render off-screen so they do not block
+    import matplotlib
+    matplotlib.use('Agg')
+
+    results = {}
+    for name in names:
+        try:
+            results[name] = run_case(name, args.warmup, args.repeats)
+        except Exception as e:
+            print(f"{name} failed: {e}")
+
+    report = {'environment': environment(), 'warmup': args.warmup, 'repeats': args.repeats, 'cases': results}
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print(f"\nComparing with {args.baseline} (threshold {args.threshold:.0%}):")
+        regressions = compare_to_baseline(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}")
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -1,30 +1,86 @@
-import pandas as pd
-from pymongo import MongoClient
-
-def load_census_data():
-    print("Loading Census data from flat file...")
-    df = pd.read_csv('USCensus1990.data.txt', header=0)
-    # If 'caseid' column exists, drop it
-    if 'caseid' in df.columns:
-        df = df.drop(columns=['caseid'])
-    return df
-
-def ingest_data_into_mongo(df):
+import argparse
+import resource
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from pymongo import MongoClient, WriteConcern
+
+from census_loader import CENSUS_FILE, iter_census_chunks
+from result_cache import bump_data_version
+
+# Function to report the peak resident set size of this process in bytes
+def peak_rss_bytes():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes on Linux
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+# Function to turn a chunk of rows into documents, column-wise so values are plain Python ints
+def chunk_to_documents(chunk):
+    columns = list(chunk.columns)
+    return [dict(zip(columns, row)) for row in zip(*(chunk[c].tolist() for c in columns))]
+
+# Function to stream the census data into MongoDB in fixed-size batches from a pool of
+# worker threads. Only a bounded number of batches is ever in memory at once.
+def ingest_data_into_mongo(path=CENSUS_FILE, source='cache', batch_size=10_000, workers=4,
+                           w=1, journal=False, drop=False, collection_name='census_data'):
     print("Connecting to MongoDB...")
-    client = MongoClient('mongodb://localhost:27017/')
-    db = client['demo_db']
-    collection = db['census_data']
-
-    print("Inserting data into MongoDB...")
-    # Convert DataFrame to dictionary records
-    data_dict = df.to_dict('records')
-    # Insert data into MongoDB
-    collection.insert_many(data_dict)
+    client = MongoClient('mongodb://localhost:27017/', maxPoolSize=max(workers, 1) + 1)
+    try:
+        db = client['demo_db']
+        collection = db[collection_name].with_options(write_concern=WriteConcern(w=w, j=journal))
+        if drop:
+            collection.drop()
+
+        print(f"Inserting data into MongoDB ({batch_size} docs per batch, {workers} workers, w={w}, j={journal})...")
+        start_time = time.time()
+
+        def insert_batch(chunk):
+            documents = chunk_to_documents(chunk)
+            collection.insert_many(documents, ordered=False)
+            return len(documents)
+
+        docs = 0
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            pending = set()
+            for chunk in iter_census_chunks(path, chunksize=batch_size, source=source):
+                # Backpressure: wait for a batch to finish before reading more
+                if len(pending) >= workers * 2:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    docs += sum(f.result() for f in done)
+                pending.add(executor.submit(insert_batch, chunk))
+            docs += sum(f.result() for f in wait(pending).done)
+    finally:
+        client.close()
+    bump_data_version('Census Data')
+
+    duration = time.time() - start_time
+    stats = {
+        'docs': docs,
+        'seconds': duration,
+        'docs_per_sec': docs / duration if duration else 0.0,
+        'peak_rss_bytes': peak_rss_bytes(),
+    }
+    print(f"Inserted {docs} documents in {duration:.2f} seconds ({stats['docs_per_sec']:.0f} docs/sec), "
+          f"peak RSS {stats['peak_rss_bytes'] / 1e6:.1f} MB.")
     print("Data ingestion completed successfully.")
+    return stats
+
+def parse_write_concern(value):
+    return int(value) if value.isdigit() else value
 
 def main():
-    df = load_census_data()
-    ingest_data_into_mongo(df)
+    parser = argparse.ArgumentParser(description="Stream the census data into MongoDB.")
+    parser.add_argument('--source', choices=['cache', 'csv'], default='cache',
+                        help="Read from the columnar cache or stream the raw CSV")
+    parser.add_argument('--batch-size', type=int, default=10_000)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--w', type=parse_write_concern, default=1, help="Write concern, e.g. 0, 1 or majority")
+    parser.add_argument('--journal', action='store_true', help="Wait for the journal on each batch")
+    parser.add_argument('--drop', action='store_true', help="Drop the collection before loading")
+    args = parser.parse_args()
+    ingest_data_into_mongo(source=args.source, batch_size=args.batch_size, workers=args.workers,
+                           w=args.w, journal=args.journal, drop=args.drop)
 
 if __name__ == '__main__':
     main()
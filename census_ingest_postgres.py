@@ -0,0 +1,202 @@
+# census_ingest_postgres.py
+import argparse
+import io
+import struct
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import numpy as np
+import psycopg2
+
+from census_loader import CENSUS_FILE, iter_census_chunks
+from result_cache import bump_data_version
+
+# Database connection parameters
+DB_HOST = 'localhost'
+DB_NAME = 'demo_db'
+DB_USER = 'user'
+DB_PASS = 'password'
+DB_PORT = '5432'
+
+# PostgreSQL column type and binary COPY wire type for each NumPy integer dtype
+PG_TYPES = {
+    'int8': ('SMALLINT', '>i2'),
+    'int16': ('SMALLINT', '>i2'),
+    'int32': ('INTEGER', '>i4'),
+    'int64': ('BIGINT', '>i8'),
+}
+
+# Declarative partitioning schemes for census_data: (method, key column, partitions).
+# Each partition is (suffix, bound); the DEFAULT partition catches codes outside the list.
+PARTITION_SCHEMES = {
+    'dAge': ('RANGE', 'dAge', [(str(age), f'FROM ({age}) TO ({age + 1})') for age in range(8)]),
+    'iSex': ('LIST', 'iSex', [(str(sex), f'IN ({sex})') for sex in (0, 1)]),
+}
+
+# Header and trailer of the PostgreSQL binary COPY format
+PGCOPY_HEADER = b'PGCOPY\n\xff\r\n\x00' + struct.pack('>ii', 0, 0)
+PGCOPY_TRAILER = struct.pack('>h', -1)
+
+def connect():
+    return psycopg2.connect(
+        host=DB_HOST,
+        database=DB_NAME,
+        user=DB_USER,
+        password=DB_PASS,
+        port=DB_PORT
+    )
+
+def quote_ident(name):
+    return '"' + name.replace('"', '""') + '"'
+
+# Function to drop the target table (its partitions go with it)
+def drop_census_table(conn, table):
+    with conn.cursor() as cursor:
+        cursor.execute(f"DROP TABLE IF EXISTS {quote_ident(table)};")
+    conn.commit()
+
+# Function to (re)create the target table from the dtypes of the first chunk, optionally
+# partitioned by one of PARTITION_SCHEMES (COPY into the parent routes rows to the partitions)
+def create_census_table(conn, table, columns, dtypes, partition_by=None):
+    column_defs = ', '.join(f"{quote_ident(c)} {PG_TYPES[str(dtypes[c])][0]}" for c in columns)
+    drop_census_table(conn, table)
+    with conn.cursor() as cursor:
+        if partition_by is None:
+            cursor.execute(f"CREATE TABLE {quote_ident(table)} ({column_defs});")
+        else:
+            method, key, partitions = PARTITION_SCHEMES[partition_by]
+            cursor.execute(f"CREATE TABLE {quote_ident(table)} ({column_defs}) "
+                           f"PARTITION BY {method} ({quote_ident(key)});")
+            for suffix, bound in partitions:
+                cursor.execute(f"CREATE TABLE {quote_ident(f'{table}_{key.lower()}_{suffix}')} "
+                               f"PARTITION OF {quote_ident(table)} FOR VALUES {bound};")
+            cursor.execute(f"CREATE TABLE {quote_ident(f'{table}_{key.lower()}_default')} "
+                           f"PARTITION OF {quote_ident(table)} DEFAULT;")
+    conn.commit()
+
+# Function to encode a chunk as a PostgreSQL binary COPY stream in one vectorized pass
+def encode_binary(chunk, dtypes):
+    fields = [('nfields', '>i2')]
+    for i, column in enumerate(chunk.columns):
+        wire = np.dtype(PG_TYPES[str(dtypes[column])][1])
+        fields += [(f'len{i}', '>i4'), (f'val{i}', wire)]
+    rows = np.empty(len(chunk), dtype=np.dtype(fields))
+    rows['nfields'] = len(chunk.columns)
+    for i, column in enumerate(chunk.columns):
+        rows[f'len{i}'] = rows.dtype[f'val{i}'].itemsize
+        rows[f'val{i}'] = chunk[column].to_numpy()
+    return PGCOPY_HEADER + rows.tobytes() + PGCOPY_TRAILER
+
+# Function to encode a chunk as CSV text
+def encode_text(chunk, dtypes):
+    buffer = io.StringIO()
+    chunk.to_csv(buffer, index=False, header=False)
+    return buffer.getvalue().encode()
+
+ENCODERS = {'binary': encode_binary, 'text': encode_text}
+COPY_OPTIONS = {'binary': '(FORMAT binary)', 'text': '(FORMAT csv)'}
+
+# Function to bulk load the census data with COPY ... FROM STDIN over several connections
+def bulk_load(table='census_data', source='cache', path=CENSUS_FILE, copy_format='binary',
+              workers=4, chunksize=100_000, indexes=(), partition_by=None):
+    layout = f", partitioned by {partition_by}" if partition_by else ""
+    print(f"Bulk loading {path} into {table} ({copy_format} COPY, {workers} workers, {chunksize} rows per chunk{layout})...")
+    start_time = time.perf_counter()
+    chunks = iter_census_chunks(path, chunksize=chunksize, source=source)
+    first = next(chunks)
+    columns = list(first.columns)
+    dtypes = first.dtypes.to_dict()
+
+    conn = connect()
+    try:
+        create_census_table(conn, table, columns, dtypes, partition_by)
+
+        local = threading.local()
+        connections = []
+        connections_lock = threading.Lock()
+        encode = ENCODERS[copy_format]
+        copy_sql = (f"COPY {quote_ident(table)} ({', '.join(quote_ident(c) for c in columns)}) "
+                    f"FROM STDIN WITH {COPY_OPTIONS[copy_format]}")
+
+        # Each worker thread holds its own connection; psycopg2 releases the GIL during COPY
+        def load_chunk(chunk):
+            if not hasattr(local, 'conn'):
+                local.conn = connect()
+                with connections_lock:
+                    connections.append(local.conn)
+            payload = encode(chunk, dtypes)
+            with local.conn.cursor() as cursor:
+                cursor.copy_expert(copy_sql, io.BytesIO(payload))
+            local.conn.commit()
+            return len(chunk)
+
+        rows = 0
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                pending = {executor.submit(load_chunk, first)}
+                for chunk in chunks:
+                    # Bound the number of in-flight chunks so memory stays flat on CSV sources
+                    if len(pending) >= workers * 2:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        rows += sum(f.result() for f in done)
+                    pending.add(executor.submit(load_chunk, chunk))
+                rows += sum(f.result() for f in pending)
+        except BaseException:
+            # Each worker commits its own chunks, so a failed load would leave a partially
+            # filled table behind: drop it (after closing the workers, which hold its locks)
+            for worker_conn in connections:
+                worker_conn.close()
+            conn.rollback()
+            drop_census_table(conn, table)
+            raise
+        finally:
+            for worker_conn in connections:
+                worker_conn.close()
+        load_seconds = time.perf_counter() - start_time
+
+        # Indexes are built once after the load instead of being maintained row by row;
+        # on a partitioned table each index is created on every partition
+        index_start = time.perf_counter()
+        with conn.cursor() as cursor:
+            for column in indexes:
+                cursor.execute(f"CREATE INDEX IF NOT EXISTS {quote_ident('idx_' + column)} "
+                               f"ON {quote_ident(table)} ({quote_ident(column)});")
+            cursor.execute(f"ANALYZE {quote_ident(table)};")
+        conn.commit()
+        index_seconds = time.perf_counter() - index_start
+    finally:
+        conn.close()
+    bump_data_version('Census Data')
+
+    duration = time.perf_counter() - start_time
+    stats = {
+        'rows': rows,
+        'load_seconds': load_seconds,
+        'index_seconds': index_seconds,
+        'total_seconds': duration,
+        'rows_per_sec': rows / load_seconds if load_seconds else 0.0,
+    }
+    print(f"Loaded {rows} rows in {load_seconds:.2f} seconds ({stats['rows_per_sec']:.0f} rows/sec), "
+          f"indexes and ANALYZE in {index_seconds:.2f} seconds.")
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk load the census data into PostgreSQL with COPY.")
+    parser.add_argument('--table', default='census_data')
+    parser.add_argument('--source', choices=['cache', 'csv'], default='cache',
+                        help="Read from the columnar cache or stream the raw CSV")
+    parser.add_argument('--format', dest='copy_format', choices=['binary', 'text'], default='binary')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--chunksize', type=int, default=100_000)
+    parser.add_argument('--index', dest='indexes', action='append', default=[],
+                        help="Column to index after the load (repeatable)")
+    parser.add_argument('--partition-by', choices=sorted(PARTITION_SCHEMES),
+                        help="Create the table range-partitioned on dAge or list-partitioned on iSex")
+    args = parser.parse_args()
+    bulk_load(table=args.table, source=args.source, copy_format=args.copy_format,
+              workers=args.workers, chunksize=args.chunksize, indexes=args.indexes,
+              partition_by=args.partition_by)
+
+if __name__ == '__main__':
+    main()
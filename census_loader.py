@@ -0,0 +1,385 @@
+# census_loader.py
+import fcntl
+import hashlib
+import json
+import operator
+import os
+import shutil
+import time
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from result_cache import bump_data_version
+
+CENSUS_FILE = 'USCensus1990.data.txt'
+CACHE_DIR = '.census_cache'
+# Bump when the on-disk layout changes so older caches are rebuilt
+CACHE_VERSION = 2
+
+# Number of bytes sampled from the head and tail of the source file for the cache key
+FINGERPRINT_SAMPLE_BYTES = 1 << 20
+
+# Rows parsed per chunk while building the cache
+BUILD_CHUNKSIZE = 250_000
+
+# Append-only log of column patches kept next to the columns, and its lock file
+DELTA_LOG = 'deltas.jsonl'
+DELTA_LOCK = 'deltas.lock'
+
+# Comparison operators allowed in delta predicates
+DELTA_OPERATORS = {
+    '==': operator.eq, '!=': operator.ne,
+    '<': operator.lt, '<=': operator.le,
+    '>': operator.gt, '>=': operator.ge,
+    'in': np.isin,
+}
+
+# Candidate integer dtypes, narrowest first
+INTEGER_DTYPES = [np.int8, np.int16, np.int32, np.int64]
+
+# Function to pick the narrowest signed integer dtype that holds every value of a column
+def narrowest_int_dtype(values):
+    if len(values) == 0:
+        return np.dtype(np.int8)
+    lo, hi = values.min(), values.max()
+    for dtype in INTEGER_DTYPES:
+        info = np.iinfo(dtype)
+        if info.min <= lo and hi <= info.max:
+            return np.dtype(dtype)
+    return values.dtype
+
+# Function to downcast every integer column of a DataFrame to its narrowest dtype
+def narrow_dtypes(df):
+    narrowed = {}
+    for column in df.columns:
+        values = df[column].to_numpy()
+        if np.issubdtype(values.dtype, np.integer):
+            values = values.astype(narrowest_int_dtype(values), copy=False)
+        narrowed[column] = values
+    return pd.DataFrame(narrowed, columns=df.columns, index=df.index, copy=False)
+
+# Function to convert coded columns to pandas Categoricals. Categorical columns
+# support equality, isin and groupby, but not range filters or arithmetic.
+def to_categorical(df, columns=None):
+    columns = df.columns if columns is None else columns
+    return df.astype({column: pd.CategoricalDtype(np.unique(df[column].to_numpy())) for column in columns})
+
+# Function to report the in-memory size of a DataFrame in bytes
+def memory_bytes(df):
+    return int(df.memory_usage(index=False, deep=True).sum())
+
+# Function to fingerprint the source CSV from its size, mtime and a sampled content hash
+def source_fingerprint(path=CENSUS_FILE):
+    stat = os.stat(path)
+    digest = hashlib.sha1()
+    digest.update(f"{CACHE_VERSION}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+    with open(path, 'rb') as f:
+        digest.update(f.read(FINGERPRINT_SAMPLE_BYTES))
+        if stat.st_size > FINGERPRINT_SAMPLE_BYTES:
+            f.seek(max(stat.st_size - FINGERPRINT_SAMPLE_BYTES, FINGERPRINT_SAMPLE_BYTES))
+            digest.update(f.read())
+    return digest.hexdigest()
+
+# Function to get the cache directory for the current version of the source file
+def cache_path(path=CENSUS_FILE, cache_dir=CACHE_DIR):
+    return os.path.join(cache_dir, source_fingerprint(path))
+
+# Function to read the cache manifest, or None if the cache has not been built
+def read_manifest(path=CENSUS_FILE, cache_dir=CACHE_DIR):
+    return manifest_at(cache_path(path, cache_dir))
+
+# Function to read the manifest of a cache directory, or None if there is none
+def manifest_at(target):
+    manifest_file = os.path.join(target, 'manifest.json')
+    if not os.path.exists(manifest_file):
+        return None
+    with open(manifest_file) as f:
+        return json.load(f)
+
+# Function to convert the CSV into one .npy file per column. The CSV is parsed in chunks
+# whose columns are spilled to part files, then each column is assembled and narrowed
+# on its own, so at most one chunk or one full column is in memory at a time.
+def build_census_cache(path=CENSUS_FILE, cache_dir=CACHE_DIR, chunksize=BUILD_CHUNKSIZE):
+    target = cache_path(path, cache_dir)
+    print(f"Building columnar cache for {path} in {target}...")
+    start_time = time.time()
+
+    # Write into a scratch directory first so a partial build is never picked up
+    scratch = target + '.tmp'
+    shutil.rmtree(scratch, ignore_errors=True)
+    os.makedirs(scratch)
+    columns = None
+    parts = {}
+    rows = 0
+    source_bytes = 0
+    for number, chunk in enumerate(pd.read_csv(path, header=0, chunksize=chunksize)):
+        if columns is None:
+            columns = list(chunk.columns)
+        rows += len(chunk)
+        source_bytes += memory_bytes(chunk)
+        for column in columns:
+            part = os.path.join(scratch, f"{column}.part{number}.npy")
+            np.save(part, chunk[column].to_numpy())
+            parts.setdefault(column, []).append(part)
+    if columns is None:
+        raise ValueError(f"{path} has no data rows")
+
+    dtypes = {}
+    narrowed_bytes = 0
+    for column in columns:
+        values = np.concatenate([np.load(part) for part in parts[column]])
+        if np.issubdtype(values.dtype, np.integer):
+            values = values.astype(narrowest_int_dtype(values), copy=False)
+        np.save(os.path.join(scratch, f"{column}.npy"), values)
+        dtypes[column] = str(values.dtype)
+        narrowed_bytes += values.nbytes
+        for part in parts[column]:
+            os.remove(part)
+    print(f"Narrowed census columns from {source_bytes / 1e6:.1f} MB to {narrowed_bytes / 1e6:.1f} MB.")
+    manifest = {
+        'source': os.path.abspath(path),
+        'rows': rows,
+        'columns': columns,
+        'dtypes': dtypes,
+        'source_bytes': source_bytes,
+        'narrowed_bytes': narrowed_bytes,
+    }
+    with open(os.path.join(scratch, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    shutil.rmtree(target, ignore_errors=True)
+    os.replace(scratch, target)
+
+    # Drop caches built from older versions of the source file
+    for entry in os.listdir(cache_dir):
+        stale = os.path.join(cache_dir, entry)
+        if stale != target and os.path.exists(os.path.join(stale, 'manifest.json')):
+            shutil.rmtree(stale, ignore_errors=True)
+
+    print(f"Columnar cache built in {time.time() - start_time:.2f} seconds.")
+    return manifest
+
+# Function to get the file holding a column; compaction writes patched columns to new files
+def column_file(target, manifest, column):
+    return os.path.join(target, manifest.get('files', {}).get(column, f"{column}.npy"))
+
+# Function to hold the delta log lock (appends and compaction are serialized, reads are not)
+@contextmanager
+def delta_lock(target):
+    with open(os.path.join(target, DELTA_LOCK), 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+# Function to read the patches not yet folded into the columns, oldest first
+def read_deltas(target, manifest):
+    log = os.path.join(target, DELTA_LOG)
+    if not os.path.exists(log):
+        return []
+    with open(log) as f:
+        deltas = [json.loads(line) for line in f if line.strip()]
+    return [delta for delta in deltas if delta['seq'] > manifest.get('compacted_seq', 0)]
+
+# Function to number the next patch, called under the delta lock. Sequence numbers only
+# grow: one past the last patch in the log or the last one compacted, whichever is later.
+def next_delta_seq(target):
+    last = manifest_at(target).get('compacted_seq', 0)
+    log = os.path.join(target, DELTA_LOG)
+    if os.path.exists(log):
+        with open(log) as f:
+            for line in f:
+                if line.strip():
+                    last = max(last, json.loads(line)['seq'])
+    return last + 1
+
+# Function to compute the rows a patch applies to, from row ids or a predicate
+def delta_rows(delta, data, rows):
+    if 'rows' in delta:
+        return np.asarray(delta['rows'], dtype=np.int64)
+    mask = np.ones(rows, dtype=bool)
+    for column, op, value in delta['where']:
+        mask &= DELTA_OPERATORS[op](data[column], value)
+    return mask
+
+# Function to apply the pending patches to the requested columns. Patched columns are
+# copied out of their memory maps; a patch's predicate sees the data as left by the
+# patches before it, so the predicate columns are patched too.
+def apply_deltas(data, deltas, target, manifest):
+    needed = set(data)
+    changed = True
+    while changed:
+        changed = False
+        for delta in deltas:
+            if delta['column'] in needed:
+                for column, _, _ in delta.get('where', []):
+                    if column not in needed:
+                        needed.add(column)
+                        changed = True
+    work = {column: data[column] if column in data else np.load(column_file(target, manifest, column), mmap_mode='r')
+            for column in needed}
+    patched = set()
+    for delta in deltas:
+        column = delta['column']
+        if column not in needed:
+            continue
+        if column not in patched:
+            work[column] = np.array(work[column])
+            patched.add(column)
+        work[column][delta_rows(delta, work, manifest['rows'])] = delta['value']
+    return {column: work[column] for column in data}
+
+# Function to load the census data, building the columnar cache on first use.
+# Columns come back in their narrowest integer dtype. With mmap=True the columns
+# are read-only memory maps; pass mmap=False to get a writable in-memory copy.
+# categorical=True (or a list of columns) converts them to pandas Categoricals.
+# Pending update patches (see update_census_data) are applied on load.
+def load_census_data(path=CENSUS_FILE, columns=None, drop_caseid=True, mmap=True, categorical=False, cache_dir=CACHE_DIR):
+    manifest = read_manifest(path, cache_dir)
+    if manifest is None:
+        manifest = build_census_cache(path, cache_dir)
+
+    target = cache_path(path, cache_dir)
+    if columns is None:
+        columns = [c for c in manifest['columns'] if not (drop_caseid and c == 'caseid')]
+    mmap_mode = 'r' if mmap else None
+    # Reads take no lock. Compaction deletes the files it replaced one compaction later, so a
+    # reader would have to span two compactions to miss one; if it does, it re-reads the manifest.
+    for attempt in range(3):
+        try:
+            data = {column: np.load(column_file(target, manifest, column), mmap_mode=mmap_mode)
+                    for column in columns}
+            deltas = read_deltas(target, manifest)
+            if deltas:
+                data = apply_deltas(data, deltas, target, manifest)
+            break
+        except FileNotFoundError:
+            if attempt == 2:
+                raise
+            manifest = read_manifest(path, cache_dir)
+    # copy=False keeps each column backed by its own memory map
+    df = pd.DataFrame(data, columns=columns, copy=False)
+    if categorical:
+        df = to_categorical(df, None if categorical is True else categorical)
+    return df
+
+# Function to update the flat-file store by appending a patch to the delta log: set
+# column to value on the rows matching where (a list of (column, op, value) with op in
+# DELTA_OPERATORS) or on the given row positions. Costs one appended line, not a
+# rewrite of the data; readers apply the patch until compact_census_cache folds it in.
+def update_census_data(column, value, where=None, rows=None, path=CENSUS_FILE, cache_dir=CACHE_DIR):
+    if (where is None) == (rows is None):
+        raise ValueError("Pass exactly one of where or rows")
+    manifest = read_manifest(path, cache_dir)
+    if manifest is None:
+        manifest = build_census_cache(path, cache_dir)
+    if column not in manifest['columns']:
+        raise KeyError(column)
+    info = np.iinfo(manifest['dtypes'][column])
+    if not info.min <= value <= info.max:
+        raise ValueError(f"{value} does not fit the {manifest['dtypes'][column]} column {column!r}")
+    target = cache_path(path, cache_dir)
+    delta = {'column': column, 'value': int(value)}
+    if where is not None:
+        for where_column, op, _ in where:
+            if where_column not in manifest['columns'] or op not in DELTA_OPERATORS:
+                raise ValueError(f"Invalid predicate on {where_column!r} with {op!r}")
+        delta['where'] = [list(clause) for clause in where]
+    else:
+        delta['rows'] = [int(row) for row in rows]
+    with delta_lock(target):
+        delta['seq'] = next_delta_seq(target)
+        with open(os.path.join(target, DELTA_LOG), 'a') as f:
+            # default= turns NumPy scalars (e.g. from a DataFrame) into plain numbers
+            f.write(json.dumps(delta, default=lambda v: v.item()) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+    # Invalidate cached app results for the census data
+    bump_data_version('Census Data')
+    return delta
+
+# Function to fold the pending patches into new column files. Only patched columns are
+# rewritten; the manifest swap is the commit point, so readers see either the old
+# columns plus the log or the new columns, never a half-applied state. The replaced
+# files and the folded patches stay on disk for readers that still hold the old
+# manifest, and are removed by the next compaction.
+def compact_census_cache(path=CENSUS_FILE, cache_dir=CACHE_DIR):
+    manifest = read_manifest(path, cache_dir)
+    if manifest is None:
+        return None
+    target = cache_path(path, cache_dir)
+    with delta_lock(target):
+        deltas = read_deltas(target, manifest)
+        if not deltas:
+            return manifest
+        start_time = time.time()
+        columns = sorted({delta['column'] for delta in deltas})
+        data = {column: np.load(column_file(target, manifest, column), mmap_mode='r') for column in columns}
+        data = apply_deltas(data, deltas, target, manifest)
+        seq = deltas[-1]['seq']
+        files = dict(manifest.get('files', {}))
+        old_files = [column_file(target, manifest, column) for column in columns]
+        for column in columns:
+            files[column] = f"{column}.{seq}.npy"
+            np.save(os.path.join(target, files[column]), data[column])
+        previous_seq = manifest.get('compacted_seq', 0)
+        retired = manifest.get('retired', [])
+        manifest = {**manifest, 'files': files, 'compacted_seq': seq,
+                    'retired': [os.path.basename(old_file) for old_file in old_files]}
+        scratch = os.path.join(target, 'manifest.json.tmp')
+        with open(scratch, 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(scratch, os.path.join(target, 'manifest.json'))
+
+        # Remove what the previous compaction replaced: its files, and the patches it folded in
+        for name in retired:
+            if os.path.exists(os.path.join(target, name)):
+                os.remove(os.path.join(target, name))
+        log = os.path.join(target, DELTA_LOG)
+        with open(log) as f:
+            kept = [line for line in f if line.strip() and json.loads(line)['seq'] > previous_seq]
+        with open(log + '.tmp', 'w') as f:
+            f.writelines(kept)
+        os.replace(log + '.tmp', log)
+    bump_data_version('Census Data')
+    print(f"Compacted {len(deltas)} patches into {len(columns)} columns in {time.time() - start_time:.2f} seconds.")
+    return manifest
+
+# Function to yield the census data in fixed-size row chunks. From the cache the
+# chunks are slices of the memory maps; from the CSV they are parsed incrementally.
+def iter_census_chunks(path=CENSUS_FILE, chunksize=100_000, source='cache', columns=None, drop_caseid=True):
+    if source == 'csv':
+        usecols = columns if columns is not None else (lambda column: not (drop_caseid and column == 'caseid'))
+        yield from pd.read_csv(path, header=0, usecols=usecols, chunksize=chunksize)
+        return
+    df = load_census_data(path, columns=columns, drop_caseid=drop_caseid)
+    for start in range(0, len(df), chunksize):
+        yield df.iloc[start:start + chunksize]
+
+# Function to report the int64 (as parsed by read_csv) and narrowed sizes of the census columns
+def census_memory_report(path=CENSUS_FILE, columns=None, drop_caseid=True, cache_dir=CACHE_DIR):
+    manifest = read_manifest(path, cache_dir)
+    if manifest is None:
+        manifest = build_census_cache(path, cache_dir)
+    if columns is None:
+        columns = [c for c in manifest['columns'] if not (drop_caseid and c == 'caseid')]
+    rows = manifest['rows']
+    before = rows * 8 * len(columns)
+    after = sum(rows * np.dtype(manifest['dtypes'][column]).itemsize for column in columns)
+    return {'rows': rows, 'columns': len(columns), 'bytes_before': before, 'bytes_after': after}
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description="Build the census columnar cache, or compact its pending update patches.")
+    parser.add_argument('--compact', action='store_true', help="Fold the delta log into the column files and exit")
+    args = parser.parse_args()
+    if args.compact:
+        compact_census_cache()
+        raise SystemExit
+    build_census_cache()
+    report = census_memory_report()
+    print(f"{report['rows']} rows x {report['columns']} columns: "
+          f"{report['bytes_before'] / 1e6:.1f} MB as int64, {report['bytes_after'] / 1e6:.1f} MB narrowed.")
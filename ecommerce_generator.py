@@ -0,0 +1,222 @@
+# ecommerce_generator.py
+import argparse
+import json
+import math
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+from faker import Faker
+
+CATEGORIES = np.array(['Electronics', 'Books', 'Clothing', 'Home', 'Toys'], dtype=object)
+COLORS = np.array(['Red', 'Blue', 'Green', 'Black', 'White'], dtype=object)
+SIZES = np.array(['S', 'M', 'L', 'XL'], dtype=object)
+
+# Number of products generated at scale 1.0 (the size of the original dataset)
+BASE_PRODUCTS = 10000
+# Products per partition; each partition gets its own seed, so output does not depend on the worker count
+PARTITION_PRODUCTS = 50000
+
+# Sizes of the pre-generated Faker vocabularies that text fields are drawn from
+VOCABULARY_SIZES = {'words': 5000, 'names': 5000, 'companies': 2000, 'sentences': 10000}
+
+# Review timestamps fall within this decade, response timestamps within this year, as with Faker's *_this_decade/year
+DECADE_START = np.datetime64('2020-01-01T00:00:00', 's')
+YEAR_START = np.datetime64('2024-01-01T00:00:00', 's')
+NOW = np.datetime64('2024-12-31T23:59:59', 's')
+
+# Function to pre-generate the Faker text that every partition draws from (cached per process)
+@lru_cache(maxsize=None)
+def build_vocabulary(seed=0):
+    fake = Faker()
+    fake.seed_instance(seed)
+    return {
+        'words': np.array([fake.word() for _ in range(VOCABULARY_SIZES['words'])], dtype=object),
+        'names': np.array([fake.name() for _ in range(VOCABULARY_SIZES['names'])], dtype=object),
+        'companies': np.array([fake.company() for _ in range(VOCABULARY_SIZES['companies'])], dtype=object),
+        'sentences': np.array([fake.sentence() for _ in range(VOCABULARY_SIZES['sentences'])], dtype=object),
+    }
+
+# Function to draw n random version-4 UUID strings in bulk
+def random_uuids(rng, n):
+    raw = rng.integers(0, 256, size=(n, 16), dtype=np.uint8)
+    raw[:, 6] = (raw[:, 6] & 0x0F) | 0x40
+    raw[:, 8] = (raw[:, 8] & 0x3F) | 0x80
+    hexes = raw.tobytes().hex()
+    return [f"{h[0:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:32]}"
+            for h in (hexes[i:i + 32] for i in range(0, 32 * n, 32))]
+
+# Function to draw a ragged list of vocabulary samples with per-row lengths in [low, high]
+def ragged_choice(rng, vocabulary, n, low, high):
+    lengths = rng.integers(low, high + 1, size=n)
+    flat = vocabulary[rng.integers(0, len(vocabulary), size=lengths.sum())]
+    offsets = np.concatenate(([0], np.cumsum(lengths)))
+    return [flat[offsets[i]:offsets[i + 1]].tolist() for i in range(n)]
+
+# Function to draw n timestamps uniformly between start and end
+def random_timestamps(rng, n, start, end):
+    span = (end - start).astype(np.int64)
+    return start + rng.integers(0, span, size=n).astype('timedelta64[s]')
+
+# Function to generate one partition of products and their reviews.
+# Nested fields (specifications, related_products, responses) are Python objects;
+# the Postgres and Mongo ingesters serialize them as they need.
+def generate_partition(num_products, seed, vocabulary_seed=0):
+    rng = np.random.default_rng(seed)
+    vocab = build_vocabulary(vocabulary_seed)
+    n = num_products
+
+    product_ids = random_uuids(rng, n)
+    battery = rng.integers(1, 25, size=n)
+    has_battery = rng.random(n) < 0.5
+    warranty = rng.integers(1, 6, size=n)
+    manufacturers = vocab['companies'][rng.integers(0, len(vocab['companies']), size=n)]
+    features = ragged_choice(rng, vocab['words'], n, 2, 5)
+    tags = ragged_choice(rng, vocab['words'], n, 5, 15)
+    dimensions = np.round(rng.uniform(5.0, 50.0, size=(n, 3)), 2).tolist()
+    specifications = [
+        {
+            'battery_life': f"{battery[i]} hours" if has_battery[i] else None,
+            'warranty': f"{warranty[i]} years",
+            'manufacturer': manufacturers[i],
+            'features': features[i],
+            'dimensions': {'length': dimensions[i][0], 'width': dimensions[i][1], 'height': dimensions[i][2]},
+            'tags': tags[i],
+        }
+        for i in range(n)
+    ]
+    related_counts = rng.integers(1, 6, size=n)
+    related_flat = random_uuids(rng, int(related_counts.sum()))
+    related_offsets = np.concatenate(([0], np.cumsum(related_counts)))
+
+    products = pd.DataFrame({
+        'product_id': product_ids,
+        'name': vocab['words'][rng.integers(0, len(vocab['words']), size=n)],
+        'price': np.round(rng.uniform(10, 1000, size=n), 2),
+        'category': CATEGORIES[rng.integers(0, len(CATEGORIES), size=n)],
+        'color': COLORS[rng.integers(0, len(COLORS), size=n)],
+        'size': SIZES[rng.integers(0, len(SIZES), size=n)],
+        'weight': np.round(rng.uniform(0.1, 10.0, size=n), 2),
+        'specifications': specifications,
+        'related_products': [related_flat[related_offsets[i]:related_offsets[i + 1]] for i in range(n)],
+    })
+
+    # Reviews: 0-10 per product, laid out contiguously in product order
+    review_counts = rng.integers(0, 11, size=n)
+    m = int(review_counts.sum())
+    response_counts = rng.integers(0, 4, size=m)
+    k = int(response_counts.sum())
+    response_flat = [
+        {'user': user, 'response': text, 'timestamp': timestamp}
+        for user, text, timestamp in zip(
+            vocab['names'][rng.integers(0, len(vocab['names']), size=k)].tolist(),
+            vocab['sentences'][rng.integers(0, len(vocab['sentences']), size=k)].tolist(),
+            random_timestamps(rng, k, YEAR_START, NOW).tolist(),
+        )
+    ]
+    response_offsets = np.concatenate(([0], np.cumsum(response_counts))).tolist()
+    responses = [response_flat[response_offsets[i]:response_offsets[i + 1]] for i in range(m)]
+
+    reviews = pd.DataFrame({
+        'product_id': np.repeat(np.array(product_ids, dtype=object), review_counts),
+        'user_name': vocab['names'][rng.integers(0, len(vocab['names']), size=m)],
+        'rating': rng.integers(1, 6, size=m),
+        'comment': vocab['sentences'][rng.integers(0, len(vocab['sentences']), size=m)],
+        'timestamp': random_timestamps(rng, m, DECADE_START, NOW),
+        'likes': rng.integers(0, 51, size=m),
+        'dislikes': rng.integers(0, 51, size=m),
+        'responses': responses,
+    })
+    return products, reviews
+
+def _generate_partition(task):
+    return generate_partition(*task)
+
+# Function to split a product count into partitions with deterministic per-partition seeds
+def partition_tasks(num_products, seed=0, partition_products=PARTITION_PRODUCTS):
+    num_partitions = max(1, math.ceil(num_products / partition_products))
+    seeds = np.random.SeedSequence(seed).spawn(num_partitions)
+    tasks = []
+    for i, child in enumerate(seeds):
+        size = min(partition_products, num_products - i * partition_products)
+        tasks.append((size, int(child.generate_state(1)[0]), seed))
+    return tasks
+
+# Function to yield (products, reviews) partitions in partition order. At most
+# two partitions per worker are in flight, so memory does not grow with the scale.
+# partition_fn runs in the worker and may post-process the partition (it receives
+# a task tuple and must be a picklable top-level function).
+def iter_ecommerce_partitions(scale=1.0, workers=None, seed=0, num_products=None,
+                              partition_products=PARTITION_PRODUCTS, partition_fn=_generate_partition):
+    num_products = num_products if num_products is not None else int(round(BASE_PRODUCTS * scale))
+    tasks = partition_tasks(num_products, seed, partition_products)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(tasks) == 1:
+        for task in tasks:
+            yield partition_fn(task)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for task in tasks:
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+            pending.append(executor.submit(partition_fn, task))
+        while pending:
+            yield pending.popleft().result()
+
+# Function to generate the full products/reviews DataFrames
+def generate_ecommerce_data(scale=1.0, workers=None, seed=0, num_products=None):
+    parts = list(iter_ecommerce_partitions(scale, workers, seed, num_products))
+    products = pd.concat([p for p, _ in parts], ignore_index=True)
+    reviews = pd.concat([r for _, r in parts], ignore_index=True)
+    return products, reviews
+
+# Function to convert a partition into the row tuples the Postgres tables expect
+def to_postgres_rows(products, reviews):
+    products = products.assign(specifications=[json.dumps(s) for s in products['specifications']])
+    reviews = reviews.assign(responses=[
+        json.dumps([{**r, 'timestamp': r['timestamp'].isoformat()} for r in rs]) for rs in reviews['responses']
+    ])
+    return products, reviews
+
+# Function to assemble the nested MongoDB product documents from a partition
+def to_mongo_documents(products, reviews):
+    review_records = reviews.drop(columns=['product_id']).rename(columns={'user_name': 'user'})
+    review_dicts = review_records.to_dict('records')
+    # Reviews are contiguous per product, so each product's reviews are a slice
+    counts = reviews['product_id'].value_counts(sort=False).reindex(products['product_id'], fill_value=0).to_numpy()
+    offsets = np.concatenate(([0], np.cumsum(counts)))
+    documents = []
+    for i, p in enumerate(products.itertuples(index=False)):
+        documents.append({
+            'product_id': p.product_id,
+            'name': p.name,
+            'price': p.price,
+            'category': p.category,
+            'attributes': {
+                'color': p.color,
+                'size': p.size,
+                'weight': p.weight,
+                'specifications': p.specifications,
+            },
+            'reviews': review_dicts[offsets[i]:offsets[i + 1]],
+            'related_products': p.related_products,
+        })
+    return documents
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate the synthetic e-commerce dataset.")
+    parser.add_argument('--scale', type=float, default=1.0, help=f"Multiple of {BASE_PRODUCTS} products")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    start_time = time.time()
+    products, reviews = generate_ecommerce_data(args.scale, args.workers, args.seed)
+    print(f"Generated {len(products)} products and {len(reviews)} reviews in {time.time() - start_time:.2f} seconds.")
+
+if __name__ == '__main__':
+    main()
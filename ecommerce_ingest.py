@@ -1,68 +1,36 @@
-import json
+import argparse
+import time
 from pymongo import MongoClient
-from faker import Faker
-import random
+import ecommerce_generator
+from result_cache import bump_data_version
 
-# Connect to MongoDB
-client = MongoClient('mongodb://localhost:27017/')
-db = client['demo_db']
-collection = db['products']
+def main():
+    parser = argparse.ArgumentParser(description="Generate the e-commerce dataset and load it into MongoDB.")
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help=f"Multiple of {ecommerce_generator.BASE_PRODUCTS} products")
+    parser.add_argument('--workers', type=int, default=None, help="Generator processes (default: all cores)")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
 
-# Drop the existing collection to avoid duplicate data
-collection.drop()
+    # Connect to MongoDB
+    client = MongoClient('mongodb://localhost:27017/')
+    db = client['demo_db']
+    collection = db['products']
 
-# Initialize Faker for generating fake data
-fake = Faker()
-data = []
+    # Drop the existing collection to avoid duplicate data
+    collection.drop()
 
-# Generate synthetic E-commerce data
-for _ in range(10000):  # Adjust the number for desired data volume
-    product = {
-        'product_id': fake.unique.uuid4(),
-        'name': fake.word(),
-        'price': round(random.uniform(10, 1000), 2),
-        'category': random.choice(['Electronics', 'Books', 'Clothing', 'Home', 'Toys']),
-        'attributes': {
-            'color': random.choice(['Red', 'Blue', 'Green', 'Black', 'White']),
-            'size': random.choice(['S', 'M', 'L', 'XL']),
-            'weight': round(random.uniform(0.1, 10.0), 2),
-            'specifications': {  # Add deeply nested specifications
-                'battery_life': f"{random.randint(1, 24)} hours" if random.choice([True, False]) else None,
-                'warranty': f"{random.randint(1, 5)} years",
-                'manufacturer': fake.company(),
-                'features': [fake.word() for _ in range(random.randint(2, 5))],
-                'dimensions': {
-                    'length': round(random.uniform(5.0, 50.0), 2),
-                    'width': round(random.uniform(5.0, 50.0), 2),
-                    'height': round(random.uniform(5.0, 50.0), 2)
-                },
-                'tags': [fake.word() for _ in range(random.randint(5, 15))]
-            }
-        },
-        'reviews': [
-            {
-                'user': fake.name(),
-                'rating': random.randint(1, 5),
-                'comment': fake.sentence(),
-                'timestamp': fake.date_time_this_decade(),
-                'likes': random.randint(0, 50),
-                'dislikes': random.randint(0, 50),
-                'responses': [  # Add nested responses within reviews
-                    {
-                        'user': fake.name(),
-                        'response': fake.sentence(),
-                        'timestamp': fake.date_time_this_year()
-                    } for _ in range(random.randint(0, 3))
-                ]
-            } for _ in range(random.randint(0, 10))
-        ],
-        'related_products': [  # Add an array of related product IDs
-            fake.unique.uuid4() for _ in range(random.randint(1, 5))
-        ]
-    }
-    data.append(product)
+    # Generate synthetic E-commerce data partition by partition and insert each as it arrives
+    start_time = time.time()
+    total = 0
+    for products_df, reviews_df in ecommerce_generator.iter_ecommerce_partitions(args.scale, args.workers, args.seed):
+        documents = ecommerce_generator.to_mongo_documents(products_df, reviews_df)
+        collection.insert_many(documents, ordered=False)
+        total += len(documents)
+        print(f"Inserted {total} products...")
+    bump_data_version('E-commerce Data')
 
-# Insert data into MongoDB
-collection.insert_many(data)
+    print(f"E-commerce data generated and inserted into MongoDB successfully ({total} products in {time.time() - start_time:.2f} seconds).")
 
-print("E-commerce data generated and inserted into MongoDB successfully.")
+if __name__ == '__main__':
+    main()
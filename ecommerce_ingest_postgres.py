@@ -1,10 +1,12 @@
+import argparse
+import io
+import queue
+import threading
+import time
 import psycopg2
-from psycopg2.extras import execute_values
-import pandas as pd
-from faker import Faker
-import random
-import json
-import uuid  # Import uuid to correctly cast related products
+import ecommerce_generator
+import ecommerce_matviews
+from result_cache import bump_data_version
 
 # Database connection parameters
 DB_HOST = 'localhost'
@@ -13,72 +15,34 @@ DB_USER = 'user'
 DB_PASS = 'password'
 DB_PORT = '5432'
 
-# Function to generate synthetic e-commerce data
-def generate_ecommerce_data(num_products=10000):
-    fake = Faker()
-    products = []
-    reviews = []
-
-    for _ in range(num_products):
-        product_id = str(uuid.uuid4())  # Convert UUID to string
-        product = {
-            'product_id': product_id,
-            'name': fake.word(),
-            'price': round(random.uniform(10, 1000), 2),
-            'category': random.choice(['Electronics', 'Books', 'Clothing', 'Home', 'Toys']),
-            'color': random.choice(['Red', 'Blue', 'Green', 'Black', 'White']),
-            'size': random.choice(['S', 'M', 'L', 'XL']),
-            'weight': round(random.uniform(0.1, 10.0), 2),
-            'specifications': json.dumps({  # Nested specifications as JSON
-                'battery_life': f"{random.randint(1, 24)} hours" if random.choice([True, False]) else None,
-                'warranty': f"{random.randint(1, 5)} years",
-                'manufacturer': fake.company(),
-                'features': [fake.word() for _ in range(random.randint(2, 5))],
-                'dimensions': {
-                    'length': round(random.uniform(5.0, 50.0), 2),
-                    'width': round(random.uniform(5.0, 50.0), 2),
-                    'height': round(random.uniform(5.0, 50.0), 2)
-                },
-                'tags': [fake.word() for _ in range(random.randint(5, 15))]
-            }),
-            'related_products': [str(uuid.uuid4()) for _ in range(random.randint(1, 5))]  # Convert each UUID to string
-        }
-        products.append(product)
-
-        num_reviews = random.randint(0, 10)
-        for _ in range(num_reviews):
-            review = {
-                'product_id': product_id,
-                'user_name': fake.name(),
-                'rating': random.randint(1, 5),
-                'comment': fake.sentence(),
-                'timestamp': fake.date_time_this_decade().isoformat(),  # Convert datetime to ISO format string
-                'likes': random.randint(0, 50),
-                'dislikes': random.randint(0, 50),
-                'responses': json.dumps([  # Nested responses as JSON
-                    {
-                        'user': fake.name(),
-                        'response': fake.sentence(),
-                        'timestamp': fake.date_time_this_year().isoformat()  # Convert datetime to ISO format string
-                    } for _ in range(random.randint(0, 3))
-                ])
-            }
-            reviews.append(review)
-
-    products_df = pd.DataFrame(products)
-    reviews_df = pd.DataFrame(reviews)
-    return products_df, reviews_df
+PRODUCT_COLUMNS = ['product_id', 'name', 'price', 'category', 'color', 'size', 'weight', 'specifications', 'related_products']
+REVIEW_COLUMNS = ['product_id', 'user_name', 'rating', 'comment', 'timestamp', 'likes', 'dislikes', 'responses']
 
+def connect():
+    return psycopg2.connect(
+        host=DB_HOST,
+        database=DB_NAME,
+        user=DB_USER,
+        password=DB_PASS,
+        port=DB_PORT
+    )
+
+# Function to create the tables without keys; primary keys, the foreign key and
+# indexes are added by finalize_tables once all rows are loaded
 def create_tables(conn):
+    # Drop the summaries first: CASCADE below removes the views and the triggers, but would
+    # leave the trigger-maintained table behind with stale contents
+    with ecommerce_matviews.pg_engine.begin() as summary_conn:
+        ecommerce_matviews.drop_summaries(summary_conn)
     with conn.cursor() as cursor:
         # Drop tables if they exist to avoid schema mismatch issues
-        cursor.execute("DROP TABLE IF EXISTS reviews;")
-        cursor.execute("DROP TABLE IF EXISTS products;")
+        cursor.execute("DROP TABLE IF EXISTS reviews CASCADE;")
+        cursor.execute("DROP TABLE IF EXISTS products CASCADE;")
 
         # Create products table with nested JSON fields
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS products (
-                product_id UUID PRIMARY KEY,
+                product_id UUID NOT NULL,
                 name TEXT,
                 price NUMERIC,
                 category TEXT,
@@ -93,8 +57,8 @@ def create_tables(conn):
         # Create reviews table with nested JSON responses
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS reviews (
-                review_id SERIAL PRIMARY KEY,
-                product_id UUID REFERENCES products(product_id),
+                review_id SERIAL,
+                product_id UUID,
                 user_name TEXT,
                 rating INTEGER,
                 comment TEXT,
@@ -107,49 +71,141 @@ def create_tables(conn):
 
         conn.commit()
 
-def insert_data(conn, products_df, reviews_df):
+# Function to add the keys and indexes that were deferred during the load
+def finalize_tables(conn):
     with conn.cursor() as cursor:
-        # Insert products with explicit casting of related_products to UUID[]
-        products_tuples = [(p.product_id, p.name, p.price, p.category, p.color, p.size, p.weight, p.specifications, 
-                           p.related_products) for p in products_df.itertuples(index=False)]
-        products_query = """
-            INSERT INTO products (product_id, name, price, category, color, size, weight, specifications, related_products)
-            VALUES %s
-            ON CONFLICT (product_id) DO NOTHING;
-        """
-        # Explicitly cast related_products to UUID[]
-        execute_values(cursor, products_query, products_tuples, template="(%s, %s, %s, %s, %s, %s, %s, %s, %s::uuid[])")
-
-        # Insert reviews
-        reviews_tuples = list(reviews_df.itertuples(index=False, name=None))
-        reviews_query = """
-            INSERT INTO reviews (product_id, user_name, rating, comment, timestamp, likes, dislikes, responses)
-            VALUES %s;
-        """
-        execute_values(cursor, reviews_query, reviews_tuples)
-
+        cursor.execute("ALTER TABLE products ADD PRIMARY KEY (product_id);")
+        cursor.execute("ALTER TABLE reviews ADD PRIMARY KEY (review_id);")
+        cursor.execute("ALTER TABLE reviews ADD FOREIGN KEY (product_id) REFERENCES products(product_id);")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_reviews_product_id ON reviews(product_id);")
+        cursor.execute("ANALYZE products;")
+        cursor.execute("ANALYZE reviews;")
         conn.commit()
 
+# Function run in the generator processes: generate one partition and encode it as COPY CSV
+def generate_copy_partition(task):
+    products_df, reviews_df = ecommerce_generator.to_postgres_rows(*ecommerce_generator.generate_partition(*task))
+    # UUID[] literal for related_products
+    products_df['related_products'] = ['{' + ','.join(ids) + '}' for ids in products_df['related_products']]
+    products_csv = io.BytesIO()
+    products_df[PRODUCT_COLUMNS].to_csv(products_csv, index=False, header=False)
+    reviews_csv = io.BytesIO()
+    reviews_df[REVIEW_COLUMNS].to_csv(reviews_csv, index=False, header=False)
+    return products_csv.getvalue(), reviews_csv.getvalue(), len(products_df), len(reviews_df)
+
+# Function to generate and load the data as a pipeline: generator processes feed a
+# bounded queue that loader connections drain with COPY, so the two stages overlap
+# and at most queue_size partitions wait in memory
+def pipelined_load(scale=1.0, workers=None, loaders=2, queue_size=4, seed=0):
+    batches = queue.Queue(maxsize=queue_size)
+    failed = threading.Event()
+    errors = []
+    totals = {'products': 0, 'reviews': 0, 'copy_seconds': 0.0}
+    totals_lock = threading.Lock()
+
+    def loader():
+        conn = None
+        try:
+            conn = connect()
+            with conn.cursor() as cursor:
+                while True:
+                    batch = batches.get()
+                    if batch is None:
+                        break
+                    if failed.is_set():
+                        continue  # Keep draining so the producer never blocks on a full queue
+                    products_csv, reviews_csv, num_products, num_reviews = batch
+                    try:
+                        copy_start = time.time()
+                        cursor.copy_expert(f"COPY products ({', '.join(PRODUCT_COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+                                           io.BytesIO(products_csv))
+                        cursor.copy_expert(f"COPY reviews ({', '.join(REVIEW_COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+                                           io.BytesIO(reviews_csv))
+                        conn.commit()
+                        with totals_lock:
+                            totals['products'] += num_products
+                            totals['reviews'] += num_reviews
+                            totals['copy_seconds'] += time.time() - copy_start
+                    except Exception as e:
+                        conn.rollback()
+                        errors.append(e)
+                        failed.set()
+        except Exception as e:
+            # E.g. the connection failed: record it so the producer stops instead of blocking
+            errors.append(e)
+            failed.set()
+        finally:
+            if conn is not None:
+                conn.close()
+
+    threads = [threading.Thread(target=loader, daemon=True) for _ in range(loaders)]
+
+    # Function to queue an item without blocking forever: gives up once no loader is left to drain the queue
+    def put(item):
+        while any(thread.is_alive() for thread in threads):
+            try:
+                batches.put(item, timeout=1.0)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    for thread in threads:
+        thread.start()
+    try:
+        for batch in ecommerce_generator.iter_ecommerce_partitions(scale, workers, seed,
+                                                                   partition_fn=generate_copy_partition):
+            if failed.is_set() or not put(batch):
+                break
+    finally:
+        for _ in threads:
+            put(None)
+        for thread in threads:
+            thread.join()
+    if errors:
+        raise errors[0]
+    return totals
+
 def main():
-    print("Generating synthetic e-commerce data...")
-    products_df, reviews_df = generate_ecommerce_data()
-    print(f"Generated {len(products_df)} products and {len(reviews_df)} reviews.")
+    parser = argparse.ArgumentParser(description="Generate the e-commerce dataset and load it into PostgreSQL.")
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help=f"Multiple of {ecommerce_generator.BASE_PRODUCTS} products")
+    parser.add_argument('--workers', type=int, default=None, help="Generator processes (default: all cores)")
+    parser.add_argument('--loaders', type=int, default=2, help="Concurrent COPY connections")
+    parser.add_argument('--queue-size', type=int, default=4, help="Generated partitions buffered ahead of the loaders")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--summaries', action='store_true',
+                        help="Also build the materialized views and trigger-maintained summary table")
+    args = parser.parse_args()
 
     print("Connecting to PostgreSQL database...")
-    conn = psycopg2.connect(
-        host=DB_HOST,
-        database=DB_NAME,
-        user=DB_USER,
-        password=DB_PASS,
-        port=DB_PORT
-    )
+    conn = connect()
 
     try:
         print("Creating tables...")
         create_tables(conn)
 
-        print("Inserting data into PostgreSQL...")
-        insert_data(conn, products_df, reviews_df)
+        print("Generating and loading synthetic e-commerce data...")
+        start_time = time.time()
+        totals = pipelined_load(args.scale, args.workers, args.loaders, args.queue_size, args.seed)
+        load_seconds = time.time() - start_time
+        print(f"Loaded {totals['products']} products and {totals['reviews']} reviews in {load_seconds:.2f} seconds "
+              f"({totals['copy_seconds']:.2f} seconds spent in COPY across loaders).")
+
+        print("Adding keys and indexes...")
+        finalize_start = time.time()
+        finalize_tables(conn)
+        bump_data_version('E-commerce Data')
+        print(f"Keys and indexes added in {time.time() - finalize_start:.2f} seconds.")
+
+        if args.summaries:
+            print("Building summary tables...")
+            summaries_start = time.time()
+            with ecommerce_matviews.pg_engine.begin() as summary_conn:
+                ecommerce_matviews.drop_summaries(summary_conn)
+                ecommerce_matviews.create_materialized_views(summary_conn)
+                ecommerce_matviews.create_trigger_summary(summary_conn)
+            print(f"Summary tables built in {time.time() - summaries_start:.2f} seconds.")
 
         print("Data ingestion completed successfully.")
     except Exception as e:
@@ -0,0 +1,263 @@
+# flat_file_engine.py
+import argparse
+import multiprocessing
+import os
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from census_loader import CACHE_DIR, CENSUS_FILE, build_census_cache, iter_census_chunks, load_census_data, read_manifest
+
+# Columns the census queries read, and the group keys of each query complexity
+QUERY_COLUMNS = ['dAge', 'dIncome1', 'iSex', 'iMarital']
+GROUP_KEYS = {'Simple': ['iSex'], 'Moderate': ['iSex'], 'Complex': ['iSex', 'iMarital']}
+MEASURE_COLUMN = 'dIncome1'
+
+# Function to compute the app's census filter as a boolean mask (filters=None keeps every row)
+def filter_mask(df, filters):
+    if filters is None:
+        return np.ones(len(df), dtype=bool)
+    # Compare the raw NumPy columns; pandas Series comparisons add overhead per operation
+    age = df['dAge'].to_numpy()
+    return (
+        (age >= filters['age_min']) &
+        (age <= filters['age_max']) &
+        (df['dIncome1'].to_numpy() >= filters['income_threshold']) &
+        np.isin(df['iSex'].to_numpy(), filters['sex_options'])
+    )
+
+# Function to aggregate one chunk into mergeable partials: count and income sum per group.
+# Sums are taken in int64 so narrowed int8 columns cannot overflow.
+def partial_aggregate(chunk, keys, filters):
+    chunk = chunk[filter_mask(chunk, filters)]
+    return chunk.assign(sum_income=chunk['dIncome1'].astype(np.int64)).groupby(keys).agg(
+        count=('sum_income', 'size'),
+        sum_income=('sum_income', 'sum'),
+    )
+
+# Function to merge partial aggregates from several chunks (or workers)
+def merge_partials(partials, keys):
+    partials = [p for p in partials if len(p)]
+    if not partials:
+        return pd.DataFrame({'count': [], 'sum_income': []},
+                            index=pd.MultiIndex.from_arrays([[]] * len(keys), names=keys))
+    return pd.concat(partials).groupby(level=keys).sum()
+
+# Function to turn merged partials into the columns the app's flat-file path returns
+def finalize(merged, query_complexity):
+    merged = merged.reset_index()
+    if query_complexity == "Simple":
+        return merged[['iSex', 'count']]
+    if query_complexity == "Moderate":
+        merged['avg_income'] = merged['sum_income'] / merged['count']
+        return merged[['iSex', 'avg_income']]
+    merged['mean'] = merged['sum_income'] / merged['count']
+    return merged[['iSex', 'iMarital', 'mean', 'count']]
+
+# In-memory engine: the pandas filter and groupby the app has always used
+def pandas_query(query_complexity, filters, path=CENSUS_FILE):
+    df = load_census_data(path)
+    df_filtered = df[filter_mask(df, filters)]
+    if query_complexity == "Simple":
+        result_df = df_filtered['iSex'].value_counts().reset_index()
+        result_df.columns = ['iSex', 'count']
+    elif query_complexity == "Moderate":
+        result_df = df_filtered.groupby('iSex')['dIncome1'].mean().reset_index()
+        result_df.columns = ['iSex', 'avg_income']
+    else:  # Complex
+        result_df = df_filtered.groupby(['iSex', 'iMarital'])['dIncome1'].agg(['mean', 'count']).reset_index()
+    return result_df, {'rows': len(df)}
+
+# Function to aggregate the census file chunk by chunk in bounded memory. Only the
+# query columns of one chunk plus the per-group partials are held at a time.
+# source='csv' parses the raw file incrementally (for files too large to cache);
+# source='cache' slices the columnar memory maps.
+def chunked_aggregate(keys, filters=None, path=CENSUS_FILE, chunksize=1_000_000, source='cache'):
+    partials = []
+    rows = 0
+    for chunk in iter_census_chunks(path, chunksize=chunksize, source=source, columns=QUERY_COLUMNS):
+        rows += len(chunk)
+        partials.append(partial_aggregate(chunk, keys, filters))
+        # Merge as we go so memory stays bounded by the number of groups, not chunks
+        if len(partials) >= 16:
+            partials = [merge_partials(partials, keys)]
+    return merge_partials(partials, keys), rows
+
+# Out-of-core engine
+def chunked_query(query_complexity, filters, path=CENSUS_FILE, chunksize=1_000_000, source='cache'):
+    merged, rows = chunked_aggregate(GROUP_KEYS[query_complexity], filters, path, chunksize, source)
+    return finalize(merged, query_complexity), {'rows': rows}
+
+# Process pools of the parallel engine, kept per worker count so repeated queries reuse them
+_pools = {}
+
+def get_pool(workers):
+    if workers not in _pools:
+        # spawn, not fork: the app process has background threads (log sink) that fork would copy mid-lock
+        _pools[workers] = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+    return _pools[workers]
+
+# Worker: open the memory-mapped columns itself and aggregate one row range. Only the
+# file path and range go in and only the small per-group partials come back, so the
+# columns are shared through the page cache instead of being pickled.
+def scan_partition(path, cache_dir, start, stop, keys, filters):
+    df = load_census_data(path, columns=QUERY_COLUMNS, cache_dir=cache_dir).iloc[start:stop]
+    return partial_aggregate(df, keys, filters)
+
+# Parallel engine: split the rows into one range per worker, scan them in a process pool, merge the partials
+def parallel_query(query_complexity, filters, path=CENSUS_FILE, workers=None, cache_dir=CACHE_DIR):
+    workers = workers or os.cpu_count()
+    manifest = read_manifest(path, cache_dir)
+    if manifest is None:
+        # Build once here rather than racing to build it in every worker
+        manifest = build_census_cache(path, cache_dir)
+    rows = manifest['rows']
+    keys = GROUP_KEYS[query_complexity]
+    bounds = np.linspace(0, rows, workers + 1).astype(int)
+    pool = get_pool(workers)
+    futures = [pool.submit(scan_partition, path, cache_dir, int(start), int(stop), keys, filters)
+               for start, stop in zip(bounds[:-1], bounds[1:])]
+    merged = merge_partials([future.result() for future in futures], keys)
+    return finalize(merged, query_complexity), {'rows': rows, 'workers': workers}
+
+# Largest code space the fused bincount kernel will allocate bins for
+MAX_BINCOUNT_BINS = 1 << 24
+
+# Function to aggregate with np.bincount instead of a hash groupby. The group keys are
+# small non-negative integer codes, so each row's bin is computed arithmetically as a
+# mixed-radix number over the key columns. The income code and the filter result are
+# folded into the same number, so one bincount yields counts per (group, income, passed)
+# and df_filtered is never materialized. Codes stay in int16 when the bins fit.
+def bincount_aggregate(df, keys, filters=None):
+    mask = filter_mask(df, filters)
+    columns = keys + [MEASURE_COLUMN]
+    sizes = [int(df[column].max()) + 1 if len(df) else 1 for column in columns] + [2]
+    bins = int(np.prod(sizes))
+    if bins > MAX_BINCOUNT_BINS or any(len(df) and df[column].min() < 0 for column in columns):
+        raise ValueError("bincount engine needs small non-negative integer codes; use the pandas engine")
+    code = df[columns[0]].to_numpy().astype(np.int16 if bins <= np.iinfo(np.int16).max else np.intp)
+    for column, size in zip(columns[1:], sizes[1:-1]):
+        code *= size
+        code += df[column].to_numpy()
+    code *= 2
+    code += mask
+    # Keep the bins of rows that passed the filter, then reduce over the income code
+    passed = np.bincount(code, minlength=bins).reshape(sizes)[..., 1]
+    passed = passed.reshape(-1, sizes[-2])
+    counts = passed.sum(axis=1)
+    sums = passed @ np.arange(sizes[-2], dtype=np.int64)
+    present = np.flatnonzero(counts)
+    index = pd.MultiIndex.from_arrays(np.unravel_index(present, sizes[:-2]), names=keys)
+    return pd.DataFrame({'count': counts[present], 'sum_income': sums[present]}, index=index)
+
+# Bincount engine: one fused pass over the memory-mapped query columns
+def bincount_query(query_complexity, filters, path=CENSUS_FILE):
+    df = load_census_data(path, columns=QUERY_COLUMNS)
+    merged = bincount_aggregate(df, GROUP_KEYS[query_complexity], filters)
+    return finalize(merged, query_complexity), {'rows': len(df)}
+
+# Flat-file engines selectable in the app: name -> function(query_complexity, filters, path, **options)
+FLAT_FILE_ENGINES = {
+    'pandas': pandas_query,
+    'chunked': chunked_query,
+    'parallel': parallel_query,
+    'bincount': bincount_query,
+}
+
+# Function to answer a census query from the flat file with the chosen engine.
+# Returns the result and stats with rows scanned, seconds and rows scanned per second.
+def query_flat_file(query_complexity, filters, engine='pandas', path=CENSUS_FILE, **options):
+    start = time.perf_counter()
+    result_df, stats = FLAT_FILE_ENGINES[engine](query_complexity, filters, path=path, **options)
+    seconds = time.perf_counter() - start
+    stats.update({'engine': engine, 'seconds': seconds, 'rows_per_sec': stats['rows'] / seconds if seconds else 0.0})
+    return result_df, stats
+
+# Function to time the parallel engine at several worker counts against the single-threaded pandas engine
+def scaling_benchmark(worker_counts, filters, path=CENSUS_FILE, repeats=5):
+    rows = []
+    for query_complexity in GROUP_KEYS:
+        configurations = [('pandas', {})] + [('parallel', {'workers': workers}) for workers in worker_counts]
+        baseline = None
+        for engine, options in configurations:
+            # One untimed run starts the pool and warms the page cache
+            query_flat_file(query_complexity, filters, engine, path, **options)
+            timings = [query_flat_file(query_complexity, filters, engine, path, **options)[1]['seconds']
+                       for _ in range(repeats)]
+            median = statistics.median(timings)
+            baseline = baseline or median
+            rows.append({
+                'query': query_complexity,
+                'engine': engine,
+                'workers': options.get('workers', 1),
+                'median_ms': median * 1000,
+                'speedup': baseline / median,
+            })
+            print(f"{query_complexity} {engine} x{rows[-1]['workers']}: median {median * 1000:.1f} ms "
+                  f"({rows[-1]['speedup']:.2f}x)")
+    return pd.DataFrame(rows)
+
+# Function to time the pandas groupby against the bincount kernel on the query group
+# keys and on visualization_test's average income by dAge
+def kernel_benchmark(filters, path=CENSUS_FILE, repeats=5):
+    df = load_census_data(path, columns=QUERY_COLUMNS)
+    workloads = {name: (keys, filters) for name, keys in GROUP_KEYS.items()}
+    workloads['By dAge (visualization)'] = (['dAge'], None)
+    kernels = {
+        'pandas': lambda keys, f: df[filter_mask(df, f)].groupby(keys)['dIncome1'].agg(['mean', 'count']),
+        'bincount': lambda keys, f: bincount_aggregate(df, keys, f).assign(mean=lambda m: m['sum_income'] / m['count']),
+    }
+    rows = []
+    for workload, (keys, f) in workloads.items():
+        for kernel_name, kernel in kernels.items():
+            kernel(keys, f)
+            timings = []
+            for _ in range(repeats):
+                start = time.perf_counter()
+                kernel(keys, f)
+                timings.append(time.perf_counter() - start)
+            rows.append({'workload': workload, 'kernel': kernel_name, 'median_ms': statistics.median(timings) * 1000})
+            print(f"{workload} {kernel_name}: median {rows[-1]['median_ms']:.1f} ms")
+    return pd.DataFrame(rows)
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the census queries with a flat-file engine.")
+    parser.add_argument('--engine', choices=sorted(FLAT_FILE_ENGINES), default='chunked')
+    parser.add_argument('--path', default=CENSUS_FILE)
+    parser.add_argument('--source', choices=['cache', 'csv'], default='cache', help="chunked engine: where chunks come from")
+    parser.add_argument('--chunksize', type=int, default=1_000_000, help="chunked engine: rows per chunk")
+    parser.add_argument('--workers', type=int, default=None, help="parallel engine: worker processes (default: all cores)")
+    parser.add_argument('--scaling', type=int, nargs='+', metavar='WORKERS',
+                        help="Benchmark the parallel engine at these worker counts against pandas")
+    parser.add_argument('--kernels', action='store_true', help="Benchmark the bincount group-by kernel against pandas")
+    parser.add_argument('--repeats', type=int, default=5, help="Benchmarks: timed runs per configuration")
+    args = parser.parse_args()
+
+    filters = {'age_min': 3, 'age_max': 5, 'income_threshold': 2, 'sex_options': [0, 1]}
+    if args.scaling:
+        print("Running Flat File Scaling Test...\n")
+        results = scaling_benchmark(args.scaling, filters, args.path, args.repeats)
+        print("\nResults:")
+        print(results.round(2).to_string(index=False))
+        return
+    if args.kernels:
+        print("Running Group-By Kernel Test...\n")
+        results = kernel_benchmark(filters, args.path, args.repeats)
+        print("\nResults:")
+        print(results.round(2).to_string(index=False))
+        return
+
+    options = {}
+    if args.engine == 'chunked':
+        options = {'source': args.source, 'chunksize': args.chunksize}
+    elif args.engine == 'parallel':
+        options = {'workers': args.workers}
+    for query_complexity in GROUP_KEYS:
+        result_df, stats = query_flat_file(query_complexity, filters, args.engine, args.path, **options)
+        print(f"\n{query_complexity}: {stats['rows']} rows scanned in {stats['seconds']:.2f} seconds "
+              f"({stats['rows_per_sec']:,.0f} rows/sec)")
+        print(result_df.to_string(index=False))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,165 @@
+# mongo_columnar.py
+import argparse
+import statistics
+import time
+import bson
+import numpy as np
+import pandas as pd
+from pymongo import MongoClient
+
+# MongoDB connection
+mongo_client = MongoClient('mongodb://localhost:27017/')
+mongo_db = mongo_client['demo_db']
+
+# Function to flatten a compound $group _id on the server: when the last stage groups on a
+# document, its fields are merged into the top level and _id is dropped, so the client gets
+# flat documents (e.g. iSex, iMarital, mean, count) instead of picking _id apart per row
+def flatten_group_id(pipeline):
+    if not pipeline or '$group' not in pipeline[-1] or not isinstance(pipeline[-1]['$group']['_id'], dict):
+        return pipeline
+    return pipeline + [
+        {'$replaceRoot': {'newRoot': {'$mergeObjects': ['$_id', '$$ROOT']}}},
+        {'$project': {'_id': 0}},
+    ]
+
+# NumPy dtypes of the fixed-width BSON element types, by type byte
+BSON_FIXED_DTYPES = {
+    0x01: '<f8',  # double
+    0x08: '?',    # boolean
+    0x10: '<i4',  # int32
+    0x12: '<i8',  # int64
+}
+
+# Function to build the structured dtype of a document whose elements are all fixed-width:
+# length, then (type byte, name, value) per element, then the terminating zero byte.
+# Returns (dtype, [(column, type byte, name bytes)]) or None if any element is variable-width.
+def fixed_document_layout(data):
+    length = int.from_bytes(data[:4], 'little')
+    fields = [('length', '<i4')]
+    elements = []
+    position = 4
+    while data[position] != 0:
+        type_byte = data[position]
+        end = data.index(0, position + 1)
+        name = bytes(data[position + 1:end + 1])
+        if type_byte not in BSON_FIXED_DTYPES:
+            return None
+        i = len(elements)
+        fields += [(f't{i}', 'u1'), (f'n{i}', f'S{len(name)}'), (f'v{i}', BSON_FIXED_DTYPES[type_byte])]
+        elements.append((name[:-1].decode(), type_byte, name))
+        position = end + 1 + np.dtype(BSON_FIXED_DTYPES[type_byte]).itemsize
+    fields.append(('end', 'u1'))
+    dtype = np.dtype(fields)
+    if dtype.itemsize != length:
+        return None
+    return dtype, elements
+
+# Function to decode a raw batch straight into NumPy columns when every document has the
+# same fixed-width layout (same fields, order and numeric types, e.g. $group output or a
+# projected numeric $match). The batch is then one structured array and no per-document
+# Python object is created. Returns None when the batch does not qualify.
+def decode_fixed_batch(batch):
+    if not batch:
+        return None
+    layout = fixed_document_layout(batch)
+    if layout is None:
+        return None
+    dtype, elements = layout
+    if len(batch) % dtype.itemsize:
+        return None
+    documents = np.frombuffer(batch, dtype=dtype)
+    # Every document must repeat the first one's framing, or the bytes are not aligned fields
+    if not ((documents['length'] == dtype.itemsize).all() and (documents['end'] == 0).all()):
+        return None
+    for i, (_, type_byte, name) in enumerate(elements):
+        if not ((documents[f't{i}'] == type_byte).all() and (documents[f'n{i}'] == name[:-1]).all()):
+            return None
+    return {column: documents[f'v{i}'].copy() for i, (column, _, _) in enumerate(elements)}
+
+# Function to decode a raw batch document by document (strings, nested or missing fields)
+def decode_batch_rows(batch, names):
+    documents = bson.decode_all(batch)
+    if names is None:
+        names = list(documents[0]) if documents else []
+    return {name: pd.Series([document.get(name) for document in documents], dtype=object) for name in names}
+
+# Function to run an aggregation and build the DataFrame column by column from raw BSON
+# batches. Batches of fixed-width documents are decoded by decode_fixed_batch without a dict
+# per document; other batches fall back to bson.decode_all and a per-column transpose.
+# schema maps column -> dtype; without it the columns are taken from the first batch.
+def aggregate_to_dataframe(collection, pipeline, schema=None, batch_size=10_000, flatten_id=True):
+    if flatten_id:
+        pipeline = flatten_group_id(pipeline)
+    names = list(schema) if schema else None
+    parts = {name: [] for name in names} if names else None
+    for batch in collection.aggregate_raw_batches(pipeline, batchSize=batch_size):
+        columns = decode_fixed_batch(batch)
+        if columns is None or (names is not None and set(columns) != set(names)):
+            columns = decode_batch_rows(batch, names)
+        if not columns or not len(next(iter(columns.values()))):
+            continue
+        if names is None:
+            names = list(columns)
+            parts = {name: [] for name in names}
+        for name in names:
+            parts[name].append(columns[name])
+    if not parts or not any(parts.values()):
+        return pd.DataFrame(columns=names or [])
+    result = {}
+    for name in names:
+        values = parts[name]
+        if all(isinstance(part, np.ndarray) for part in values):
+            series = pd.Series(np.concatenate(values))
+        else:
+            series = pd.concat([pd.Series(part) for part in values], ignore_index=True)
+            series = series.infer_objects()
+        result[name] = series.astype(schema[name]) if schema and schema.get(name) else series
+    return pd.DataFrame(result)
+
+# Function to build the DataFrame the old way: every document decoded into a dict first
+def aggregate_to_dataframe_rows(collection, pipeline):
+    return pd.DataFrame(list(collection.aggregate(pipeline)))
+
+def main():
+    from mongo_index_test import census_pipelines, products_pipelines
+
+    parser = argparse.ArgumentParser(description="Compare row-wise and columnar decoding of MongoDB aggregation results.")
+    parser.add_argument('--age', type=int, default=5, help='"dAge" of the unaggregated $match pipeline')
+    parser.add_argument('--repeats', type=int, default=5)
+    args = parser.parse_args()
+
+    census_params = {'age_min': 3, 'age_max': 5, 'income_threshold': 2, 'sex_options': [0, 1]}
+    products_params = {'price_min': 10.0, 'price_max': 500.0, 'categories': ['Electronics', 'Books', 'Clothing']}
+    workloads = {}
+    for name, pipeline in census_pipelines(census_params).items():
+        workloads[f'census {name}'] = ('census_data', pipeline)
+    for name, pipeline in products_pipelines(products_params).items():
+        workloads[f'products {name}'] = ('products', pipeline)
+    workloads['census $match only'] = ('census_data', [{'$match': {'dAge': args.age}}, {'$project': {'_id': 0}}])
+
+    decoders = {'rows': aggregate_to_dataframe_rows, 'columnar': aggregate_to_dataframe}
+    print("Running MongoDB Decode Test...\n")
+    rows = []
+    for workload, (collection_name, pipeline) in workloads.items():
+        collection = mongo_db[collection_name]
+        for decoder_name, decoder in decoders.items():
+            timings = []
+            for _ in range(args.repeats):
+                start = time.perf_counter()
+                result = decoder(collection, pipeline)
+                timings.append(time.perf_counter() - start)
+            row = {
+                'workload': workload,
+                'decoder': decoder_name,
+                'rows': len(result),
+                'median_ms': statistics.median(timings) * 1000,
+                'min_ms': min(timings) * 1000,
+            }
+            print(f"{workload} via {decoder_name}: {row['rows']} rows, median {row['median_ms']:.1f} ms")
+            rows.append(row)
+
+    print("\nResults:")
+    print(pd.DataFrame(rows).round(2).to_string(index=False))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,177 @@
+# mongo_index_test.py
+import argparse
+import statistics
+import time
+import pandas as pd
+from pymongo import ASCENDING, MongoClient
+from query_plans import explain_mongo
+
+# MongoDB connection
+mongo_client = MongoClient('mongodb://localhost:27017/')
+mongo_db = mongo_client['demo_db']
+
+# The app's MongoDB pipelines (same stages as app.py / populate_query_logs.py)
+def census_pipelines(params):
+    match = {'$match': {
+        'dAge': {'$gte': params['age_min'], '$lte': params['age_max']},
+        'dIncome1': {'$gte': params['income_threshold']},
+        'iSex': {'$in': params['sex_options']}
+    }}
+    return {
+        'Simple': [match, {'$group': {'_id': '$iSex', 'count': {'$sum': 1}}}],
+        'Moderate': [match, {'$group': {'_id': '$iSex', 'avg_income': {'$avg': '$dIncome1'}}}],
+        'Complex': [match, {'$group': {
+            '_id': {'iSex': '$iSex', 'iMarital': '$iMarital'},
+            'mean': {'$avg': '$dIncome1'},
+            'count': {'$sum': 1}
+        }}],
+    }
+
+def products_pipelines(params):
+    price = {'$gte': params['price_min'], '$lte': params['price_max']}
+    match = {'$match': {'price': price, 'category': {'$in': params['categories']}}}
+    return {
+        'Simple': [
+            {'$match': {'price': price}},
+            {'$group': {'_id': '$category', 'average_price': {'$avg': '$price'}}}
+        ],
+        'Moderate': [
+            match,
+            {'$unwind': '$reviews'},
+            {'$group': {'_id': '$category', 'average_rating': {'$avg': '$reviews.rating'}}}
+        ],
+        'Complex': [
+            match,
+            {'$unwind': '$reviews'},
+            {'$group': {
+                '_id': {'category': '$category', 'color': '$attributes.color'},
+                'average_rating': {'$avg': '$reviews.rating'},
+                'average_price': {'$avg': '$price'}
+            }}
+        ],
+    }
+
+PIPELINES = {'census_data': census_pipelines, 'products': products_pipelines}
+
+# Index sets: (keys, options) per collection. Compound indexes follow the ESR rule:
+# equality fields first, then sort fields (none here), then range fields.
+def index_sets(params):
+    return {
+        'no_index': {'census_data': [], 'products': []},
+        'single_field': {
+            'census_data': [([('dAge', ASCENDING)], {})],
+            'products': [([('price', ASCENDING)], {})],
+        },
+        'compound_esr': {
+            'census_data': [([('iSex', ASCENDING), ('dAge', ASCENDING), ('dIncome1', ASCENDING)], {})],
+            'products': [([('category', ASCENDING), ('price', ASCENDING)], {})],
+        },
+        'partial': {
+            # Only index the documents the range filters can match; the queries must
+            # repeat the partialFilterExpression condition for the planner to use them
+            'census_data': [([('iSex', ASCENDING), ('dAge', ASCENDING)],
+                             {'partialFilterExpression': {'dIncome1': {'$gte': params['income_threshold']}}})],
+            'products': [([('category', ASCENDING), ('price', ASCENDING)],
+                          {'partialFilterExpression': {'price': {'$gte': params['price_min']}}})],
+        },
+    }
+
+# Function to get the on-disk size of the named indexes of a collection
+def index_bytes(collection, names):
+    stats = next(collection.aggregate([{'$collStats': {'storageStats': {}}}]))
+    sizes = stats['storageStats'].get('indexSizes', {})
+    return sum(sizes.get(name, 0) for name in names)
+
+# Function to run every pipeline against one index set; created indexes are dropped afterwards unless keep=True
+def run_index_set(name, indexes, params, repeats, keep=False):
+    print(f"\nIndex set: {name}")
+    rows = []
+    created = {}
+    try:
+        for collection_name, specs in indexes.items():
+            collection = mongo_db[collection_name]
+            existing = set(collection.index_information())
+            build_start = time.perf_counter()
+            names = [collection.create_index(keys, **options) for keys, options in specs]
+            # Never drop an index that was already there before the benchmark
+            created[collection_name] = [index_name for index_name in names if index_name not in existing]
+            build_seconds = time.perf_counter() - build_start
+            size = index_bytes(collection, names)
+            print(f"{collection_name}: built in {build_seconds:.2f} seconds, index size {size / 1e6:.1f} MB")
+
+            for complexity, pipeline in PIPELINES[collection_name](params).items():
+                start = time.perf_counter()
+                list(collection.aggregate(pipeline))
+                cold = time.perf_counter() - start
+                warm = []
+                for _ in range(repeats):
+                    start = time.perf_counter()
+                    list(collection.aggregate(pipeline))
+                    warm.append(time.perf_counter() - start)
+                plan = explain_mongo(collection, pipeline)
+                row = {
+                    'index_set': name,
+                    'collection': collection_name,
+                    'query': complexity,
+                    'build_seconds': build_seconds,
+                    'index_mb': size / 1e6,
+                    'cold_ms': cold * 1000,
+                    'warm_median_ms': statistics.median(warm) * 1000,
+                    'warm_min_ms': min(warm) * 1000,
+                    'docs_examined': plan['docs_examined'],
+                    'keys_examined': plan['keys_examined'],
+                    'plan': plan['summary'],
+                }
+                print(f"  {complexity}: cold {row['cold_ms']:.1f} ms, warm median {row['warm_median_ms']:.1f} ms, "
+                      f"{row['docs_examined']} docs / {row['keys_examined']} keys examined ({row['plan']})")
+                rows.append(row)
+    finally:
+        if not keep:
+            for collection_name, names in created.items():
+                for index_name in names:
+                    mongo_db[collection_name].drop_index(index_name)
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark MongoDB index sets for the app's census and products pipelines.")
+    parser.add_argument('--index-set', action='append',
+                        choices=['no_index', 'single_field', 'compound_esr', 'partial'],
+                        help="Index set to run (repeatable; default: all)")
+    parser.add_argument('--age-min', type=int, default=3)
+    parser.add_argument('--age-max', type=int, default=5)
+    parser.add_argument('--income-threshold', type=int, default=2)
+    parser.add_argument('--sex', type=int, action='append', default=None, help="iSex values (default: 0 and 1)")
+    parser.add_argument('--price-min', type=float, default=10.0)
+    parser.add_argument('--price-max', type=float, default=500.0)
+    parser.add_argument('--category', action='append', default=None,
+                        help="Categories (default: Electronics, Books, Clothing)")
+    parser.add_argument('--repeats', type=int, default=5, help="Warm runs per query")
+    parser.add_argument('--keep', action='store_true',
+                        help="Leave the last index set in place (e.g. for nosql_vs_sql_test.py)")
+    parser.add_argument('--output', help="Write the results to this CSV file")
+    args = parser.parse_args()
+
+    params = {
+        'age_min': args.age_min,
+        'age_max': args.age_max,
+        'income_threshold': args.income_threshold,
+        'sex_options': args.sex or [0, 1],
+        'price_min': args.price_min,
+        'price_max': args.price_max,
+        'categories': args.category or ['Electronics', 'Books', 'Clothing'],
+    }
+    sets = index_sets(params)
+    names = args.index_set or list(sets)
+    print("Running MongoDB Index Test...")
+    rows = []
+    for k, name in enumerate(names):
+        rows.extend(run_index_set(name, sets[name], params, args.repeats, keep=args.keep and k == len(names) - 1))
+
+    results = pd.DataFrame(rows)
+    print("\nResults:")
+    print(results.round(2).to_string(index=False))
+    if args.output:
+        results.to_csv(args.output, index=False)
+
+if __name__ == '__main__':
+    main()
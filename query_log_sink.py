@@ -0,0 +1,186 @@
+# query_log_sink.py
+import atexit
+import queue
+import threading
+import time
+import traceback
+from datetime import datetime
+
+from sqlalchemy import text
+
+INSERT_QUERY = text("""
+    INSERT INTO query_logs (timestamp, data_source, query_complexity, dataset, duration, cache_hit, run_id)
+    VALUES (:timestamp, :data_source, :query_complexity, :dataset, :duration, :cache_hit, :run_id)
+""")
+
+INSERT_PLAN_QUERY = text("""
+    INSERT INTO query_plans (run_id, backend, plan_run, planning_ms, execution_ms, shared_hit_blocks, shared_read_blocks,
+                             temp_read_blocks, temp_written_blocks, docs_examined, keys_examined, summary, plan_json)
+    VALUES (:run_id, :backend, :plan_run, :planning_ms, :execution_ms, :shared_hit_blocks, :shared_read_blocks,
+            :temp_read_blocks, :temp_written_blocks, :docs_examined, :keys_examined, :summary, :plan_json)
+""")
+
+INSERT_QUERIES = {'log': INSERT_QUERY, 'plan': INSERT_PLAN_QUERY}
+
+# Function to create the query_logs and query_plans tables, adding columns introduced after query_logs was first created
+def ensure_query_logs_table(engine):
+    with engine.begin() as conn:
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS query_logs (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                data_source VARCHAR(255),
+                query_complexity VARCHAR(255),
+                dataset VARCHAR(255),  -- Added dataset column
+                duration FLOAT,
+                cache_hit BOOLEAN NOT NULL DEFAULT FALSE,  -- Served from the app's result cache
+                run_id CHAR(36) NULL,  -- Links to query_plans when a plan was captured
+                INDEX idx_query_logs_run_id (run_id)
+            );
+        """))
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS query_plans (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                run_id CHAR(36) NOT NULL,
+                backend VARCHAR(255),
+                plan_run VARCHAR(16) NULL,  -- 'timed' (the logged execution) or 'rerun' (a separate, warm run)
+                planning_ms FLOAT NULL,
+                execution_ms FLOAT NULL,
+                shared_hit_blocks BIGINT NULL,
+                shared_read_blocks BIGINT NULL,
+                temp_read_blocks BIGINT NULL,
+                temp_written_blocks BIGINT NULL,
+                docs_examined BIGINT NULL,
+                keys_examined BIGINT NULL,
+                summary TEXT,
+                plan_json LONGTEXT,
+                INDEX idx_query_plans_run_id (run_id)
+            );
+        """))
+        existing = {row[0] for row in conn.execute(text("""
+            SELECT COLUMN_NAME FROM information_schema.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'query_logs';
+        """))}
+        if 'cache_hit' not in existing:
+            conn.execute(text("ALTER TABLE query_logs ADD COLUMN cache_hit BOOLEAN NOT NULL DEFAULT FALSE;"))
+        if 'run_id' not in existing:
+            conn.execute(text("ALTER TABLE query_logs ADD COLUMN run_id CHAR(36) NULL, ADD INDEX idx_query_logs_run_id (run_id);"))
+        plan_columns = {row[0] for row in conn.execute(text("""
+            SELECT COLUMN_NAME FROM information_schema.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'query_plans';
+        """))}
+        if 'plan_run' not in plan_columns:
+            conn.execute(text("ALTER TABLE query_plans ADD COLUMN plan_run VARCHAR(16) NULL AFTER backend;"))
+
+# Buffered writer for query_logs. log() only enqueues a record; a background thread
+# writes the queue in batches (one executemany per batch, which PyMySQL sends as a
+# multi-row INSERT) when batch_size records are waiting or flush_interval seconds
+# have passed. A full queue blocks the caller, so memory stays bounded.
+class QueryLogSink:
+    def __init__(self, engine, batch_size=500, flush_interval=1.0, max_queue=10000):
+        self.engine = engine
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.stats = {
+            'enqueued': 0,
+            'written': 0,
+            'batches': 0,
+            'errors': 0,
+            'enqueue_seconds': 0.0,  # Time callers spent in log(), including backpressure waits
+            'write_seconds': 0.0,    # Time the background thread spent writing batches
+        }
+        self.stats_lock = threading.Lock()
+        self.closed = False
+        self.thread = threading.Thread(target=self._run, name='query-log-sink', daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+
+    # Function to queue one query log record; run_id links it to a captured plan
+    def log(self, data_source, query_complexity, dataset, duration, cache_hit=False, run_id=None):
+        self._put('log', {
+            'timestamp': datetime.now(),
+            'data_source': data_source,
+            'query_complexity': query_complexity,
+            'dataset': dataset,
+            'duration': duration,
+            'cache_hit': cache_hit,
+            'run_id': run_id,
+        })
+
+    # Function to queue a plan summary (from query_plans.explain_postgres/explain_mongo)
+    def log_plan(self, run_id, plan):
+        self._put('plan', {'run_id': run_id, **plan})
+
+    def _put(self, kind, record):
+        start = time.perf_counter()
+        self.queue.put((kind, record))
+        with self.stats_lock:
+            self.stats['enqueued'] += 1
+            self.stats['enqueue_seconds'] += time.perf_counter() - start
+
+    # Function to write everything queued so far and wait until it is committed
+    def flush(self, timeout=None):
+        if self.closed:
+            return
+        done = threading.Event()
+        self.queue.put(done)
+        done.wait(timeout)
+
+    # Function to flush the queue and stop the background thread
+    def close(self):
+        if self.closed:
+            return
+        self.flush()
+        self.closed = True
+        self.queue.put(None)
+        self.thread.join()
+
+    def _write(self, batch):
+        start = time.perf_counter()
+        try:
+            with self.engine.begin() as conn:
+                for kind, query in INSERT_QUERIES.items():
+                    records = [record for record_kind, record in batch if record_kind == kind]
+                    if records:
+                        conn.execute(query, records)
+            with self.stats_lock:
+                self.stats['written'] += len(batch)
+                self.stats['batches'] += 1
+        except Exception as e:
+            with self.stats_lock:
+                self.stats['errors'] += 1
+            print(f"An error occurred while writing {len(batch)} query logs: {e}")
+            print(traceback.format_exc())
+        with self.stats_lock:
+            self.stats['write_seconds'] += time.perf_counter() - start
+
+    def _run(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                item = self.queue.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                item = False  # Interval elapsed
+            if isinstance(item, tuple):
+                batch.append(item)
+                if len(batch) < self.batch_size:
+                    continue
+            if batch:
+                self._write(batch)
+                batch = []
+            deadline = time.monotonic() + self.flush_interval
+            if isinstance(item, threading.Event):
+                item.set()
+            elif item is None:
+                return
+
+    # Function to summarize the instrumentation overhead
+    def summary(self):
+        with self.stats_lock:
+            stats = dict(self.stats)
+        stats['pending'] = self.queue.qsize()
+        stats['mean_enqueue_us'] = stats['enqueue_seconds'] / stats['enqueued'] * 1e6 if stats['enqueued'] else 0.0
+        stats['mean_batch_ms'] = stats['write_seconds'] / stats['batches'] * 1000 if stats['batches'] else 0.0
+        return stats
@@ -0,0 +1,83 @@
+# query_plans.py
+import json
+from sqlalchemy import text
+
+# Which execution a plan describes (stored with it in query_plans.plan_run):
+#   timed - the EXPLAIN ANALYZE run was the timed execution, so its buffer counts match the logged duration
+#   rerun - a separate run after the timed one, usually on a warm cache
+PLAN_RUNS = ['timed', 'rerun']
+
+# Function to run EXPLAIN (ANALYZE, BUFFERS) on a PostgreSQL query and summarize the plan
+def explain_postgres(conn, query, params, plan_run='rerun'):
+    plan = conn.execute(text("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + str(query)), params).scalar()[0]
+    root = plan['Plan']
+    node_types = []
+
+    def walk(node):
+        node_types.append(node['Node Type'])
+        for child in node.get('Plans', []):
+            walk(child)
+
+    walk(root)
+    return {
+        'backend': 'PostgreSQL',
+        'plan_run': plan_run,
+        'planning_ms': plan.get('Planning Time'),
+        'execution_ms': plan.get('Execution Time'),
+        'shared_hit_blocks': root.get('Shared Hit Blocks', 0),
+        'shared_read_blocks': root.get('Shared Read Blocks', 0),
+        'temp_read_blocks': root.get('Temp Read Blocks', 0),
+        'temp_written_blocks': root.get('Temp Written Blocks', 0),
+        'docs_examined': None,
+        'keys_examined': None,
+        'summary': ' > '.join(dict.fromkeys(node_types)),
+        'plan_json': json.dumps(plan, default=str),
+    }
+
+# Function to find the executionStats section of an aggregate explain, wherever the server put it
+def _find_execution_stats(explain):
+    if 'executionStats' in explain:
+        return explain['executionStats']
+    for stage in explain.get('stages', []):
+        cursor = stage.get('$cursor', {})
+        if 'executionStats' in cursor:
+            return cursor['executionStats']
+    for shard in explain.get('shards', {}).values():
+        stats = _find_execution_stats(shard)
+        if stats:
+            return stats
+    return {}
+
+def _stage_names(stage):
+    names = [stage.get('stage', '?')]
+    for key in ('inputStage', 'queryPlan'):
+        if key in stage:
+            names += _stage_names(stage[key])
+    for child in stage.get('inputStages', []):
+        names += _stage_names(child)
+    return names
+
+# Function to run explain("executionStats") on a MongoDB aggregation pipeline and summarize it
+def explain_mongo(collection, pipeline, plan_run='rerun'):
+    explain = collection.database.command(
+        'explain',
+        {'aggregate': collection.name, 'pipeline': pipeline, 'cursor': {}},
+        verbosity='executionStats'
+    )
+    stats = _find_execution_stats(explain)
+    stages = [next(iter(stage)) for stage in explain.get('stages', [])]
+    scan = _stage_names(stats.get('executionStages', {})) if stats else []
+    return {
+        'backend': 'MongoDB',
+        'plan_run': plan_run,
+        'planning_ms': None,
+        'execution_ms': stats.get('executionTimeMillis'),
+        'shared_hit_blocks': None,
+        'shared_read_blocks': None,
+        'temp_read_blocks': None,
+        'temp_written_blocks': None,
+        'docs_examined': stats.get('totalDocsExamined'),
+        'keys_examined': stats.get('totalKeysExamined'),
+        'summary': ' > '.join(dict.fromkeys(scan + stages)),
+        'plan_json': json.dumps(explain, default=str),
+    }
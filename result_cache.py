@@ -0,0 +1,92 @@
+# result_cache.py
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# Per-dataset data versions shared between processes. Anything that writes to a
+# dataset calls bump_data_version, which invalidates cached results for it.
+DATA_VERSION_FILE = '.data_versions.json'
+
+def _read_versions():
+    try:
+        with open(DATA_VERSION_FILE) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+# Function to get the current version of a dataset
+def data_version(dataset):
+    return _read_versions().get(dataset, 0)
+
+# Function to mark a dataset as changed so cached query results for it are dropped
+def bump_data_version(dataset):
+    versions = _read_versions()
+    versions[dataset] = versions.get(dataset, 0) + 1
+    scratch = DATA_VERSION_FILE + f'.{os.getpid()}.tmp'
+    with open(scratch, 'w') as f:
+        json.dump(versions, f)
+    os.replace(scratch, DATA_VERSION_FILE)
+    return versions[dataset]
+
+# Function to normalize query parameters so equivalent sidebar settings share a key
+def normalize_params(params):
+    normalized = {}
+    for name, value in params.items():
+        if isinstance(value, (list, tuple, set)):
+            value = sorted(value)
+        elif isinstance(value, float) and value.is_integer():
+            value = int(value)
+        normalized[name] = value
+    return json.dumps(normalized, sort_keys=True, default=str)
+
+# Function to build a cache key for a query
+def result_cache_key(data_source, dataset, query_complexity, params):
+    return (data_source, dataset, query_complexity, normalize_params(params))
+
+# Size-bounded LRU cache of query results with a TTL. Each entry remembers the data
+# version of its dataset, so a bump_data_version from any process turns it into a miss.
+class ResultCache:
+    def __init__(self, max_entries=128, ttl_seconds=300):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        dataset = key[1]
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                stored_at, version, value = entry
+                if time.monotonic() - stored_at <= self.ttl_seconds and version == data_version(dataset):
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return value.copy()
+                del self.entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        dataset = key[1]
+        with self.lock:
+            self.entries[key] = (time.monotonic(), data_version(dataset), value.copy())
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    # Function to drop cached results, for one dataset or all of them
+    def invalidate(self, dataset=None):
+        with self.lock:
+            if dataset is None:
+                self.entries.clear()
+            else:
+                for key in [k for k in self.entries if k[1] == dataset]:
+                    del self.entries[key]
+
+    def summary(self):
+        with self.lock:
+            return {'entries': len(self.entries), 'hits': self.hits, 'misses': self.misses}